@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_read_db
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models.user import User
-from app.models.product import Preorder
+from app.models.analytics import UserRollup
+from app.services import archive, exports, settlement
+from app.services.identity import identity_cache
 from pydantic import BaseModel
 from typing import List, Optional
-from sqlalchemy import func
+from sqlalchemy import and_, func, or_, select
 
 router = APIRouter()
 
@@ -18,39 +23,114 @@ class UserStats(BaseModel):
     order_count: int
     total_spent: float
 
+REGISTRY_SORTS = ("id", "total_spent", "order_count")
+
 @router.get("/users", response_model=List[UserStats])
-async def get_user_registry(db: Session = Depends(get_db)):
-    """Retrieve all protocol-activated identities with procurement stats"""
+async def get_user_registry(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", enum=list(REGISTRY_SORTS)),
+    email: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Retrieve protocol-activated identities with procurement stats, one keyset page at a time.
+    The cursor for the next page is returned in the X-Next-Cursor header."""
+    # Stats come from the maintained per-user rollup, so a page never aggregates preorders
+    order_count = func.coalesce(UserRollup.order_count, 0).label("order_count")
+    spent_cents = func.coalesce(UserRollup.spent_cents, 0).label("spent_cents")
+    query = select(
+        User.id, User.email, User.full_name, User.phone_number, User.is_active, order_count, spent_cents,
+    ).outerjoin(UserRollup, UserRollup.user_email == User.email)
+    if email:
+        query = query.filter(User.email.startswith(email, autoescape=True))
+    
+    if sort == "id":
+        query = query.order_by(User.id)
+        if cursor:
+            (last_id,) = decode_cursor(cursor, int)
+            query = query.filter(User.id > last_id)
+    else:
+        # Spend is keyed in whole cents, so rows on a page boundary compare exactly
+        metric = spent_cents if sort == "total_spent" else order_count
+        query = query.order_by(metric.desc(), User.id.desc())
+        if cursor:
+            last_value, last_id = decode_cursor(cursor, int, int)
+            query = query.filter(or_(
+                metric < last_value,
+                and_(metric == last_value, User.id < last_id),
+            ))
     
-    users = db.query(User).all()
-    registry = []
+    result = await db.execute(query.limit(limit))
+    rows = result.mappings().all()
+    registry = [
+        {
+            "id": row["id"], "email": row["email"], "full_name": row["full_name"],
+            "phone_number": row["phone_number"], "is_active": row["is_active"],
+            "order_count": row["order_count"], "total_spent": row["spent_cents"] / 100,
+        }
+        for row in rows
+    ]
     
-    for user in users:
-        # Get procurement stats for this user
-        stats = db.query(
-            func.count(Preorder.id).label('count'),
-            func.sum(Preorder.price_locked * Preorder.quantity).label('total')
-        ).filter(Preorder.user_email == user.email).first()
-        
-        registry.append({
-            "id": user.id,
-            "email": user.email,
-            "full_name": user.full_name,
-            "phone_number": user.phone_number,
-            "is_active": user.is_active,
-            "order_count": stats[0] or 0,
-            "total_spent": float(stats[1] or 0)
-        })
-        
+    if len(rows) == limit:
+        last = rows[-1]
+        key = {"id": (), "total_spent": (last["spent_cents"],), "order_count": (last["order_count"],)}[sort]
+        response.headers["X-Next-Cursor"] = encode_cursor(*key, last["id"])
     return registry
 
 @router.patch("/users/{user_id}/toggle-status")
-async def toggle_user_status(user_id: int, db: Session = Depends(get_db)):
+async def toggle_user_status(user_id: int, db: AsyncSession = Depends(get_db)):
     """Deactivate or Reactivate a protocol identity"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Identity not found")
     
     user.is_active = not user.is_active
-    db.commit()
+    await db.commit()
+    await identity_cache.forget([user.email])
     return {"status": "Updated", "is_active": user.is_active}
+
+@router.post("/settlements/sweep")
+async def sweep_settlements(full_scan: bool = False):
+    """Settle every cluster that is past its deadline or has reached target, now"""
+    return await settlement.sweep(full_scan)
+
+@router.post("/preorders/archive")
+async def archive_preorders(max_batches: int = Query(0, ge=0, description="0 = everything due")):
+    """Move settled preorders older than PREORDER_ARCHIVE_AFTER_DAYS to cold storage, now"""
+    return await archive.run_archive(max_batches)
+
+@router.get("/preorders/archive")
+async def archive_status(db: AsyncSession = Depends(get_db)):
+    """Archived files and rows, and preorder partitions on PostgreSQL"""
+    return await archive.status(db)
+
+@router.get("/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query("csv", enum=list(exports.FORMATS)),
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status: Optional[str] = None,
+):
+    """Stream a full table as CSV or NDJSON, filtered by created_at range and status"""
+    if dataset not in exports.DATASETS:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    if status and status not in exports.STATUSES[dataset]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"status must be one of: {', '.join(exports.STATUSES[dataset])}"
+        )
+    
+    query = exports.build_query(dataset, start, end, status)
+    filename = f"{dataset}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{format}"
+    media_type = exports.FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        exports.stream_rows(query, format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,37 +1,56 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.core.database import get_db
-from app.models.product import Product, Preorder
+import asyncio
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import BaseModel, Field
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import cache
+from app.core.cache import response_cache
+from app.core.database import get_read_db
+from app.models.product import Product
+from app.services import counters, rollups
+from app.services.tariffs import snapshots
+from app.services.trending import velocity
+from typing import List
+import time
 
 router = APIRouter()
 
+class TariffRule(BaseModel):
+    category: str | None = None
+    country: str | None = None  # supplier_info["country"], e.g. "CN"
+    rate: float = Field(ge=0, le=1000)
+
+class TariffScenario(BaseModel):
+    name: str
+    rules: List[TariffRule] = []
+    default_rate: float | None = Field(None, ge=0, le=1000)
+    retail_pass_through: float = Field(0.0, ge=0, le=1)
+
+class TariffSimulation(BaseModel):
+    scenarios: List[TariffScenario] = Field(min_length=1, max_length=100)
+    by_category: bool = True
+    top_products: int = Field(0, ge=0, le=50)
+
 @router.get("/dashboard")
-async def get_dashboard_stats(db: Session = Depends(get_db)):
+async def get_dashboard_stats(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get overall platform statistics"""
+    return await response_cache.respond(request, [cache.PRODUCTS, cache.CATALOG], lambda: dashboard_stats(db))
+
+async def dashboard_stats(db: AsyncSession) -> dict:
+    # O(categories) read of the incrementally maintained rollups
+    categories = await rollups.load(db)
     
-    total_products = db.query(Product).filter(Product.is_active == True).count()
-    total_preorders = db.query(func.sum(Preorder.quantity)).scalar() or 0
-    
-    # Calculate total savings
-    savings_data = db.query(
-        func.sum((Product.retail_price - Product.group_buy_price) * Product.current_preorders)
-    ).scalar() or 0
-    
-    # Active campaigns
-    active_campaigns = db.query(Product).filter(
-        Product.is_active == True,
-        Product.current_preorders > 0
-    ).count()
+    total_products = sum(c.active_products for c in categories)
+    total_preorders = sum(c.preorder_units for c in categories)
+    savings_data = sum(c.savings_total for c in categories)
+    active_campaigns = sum(c.active_campaigns for c in categories)
     
     # Top categories
-    top_categories = db.query(
-        Product.category,
-        func.count(Product.id).label('count'),
-        func.sum(Product.current_preorders).label('total_preorders')
-    ).filter(
-        Product.is_active == True
-    ).group_by(Product.category).order_by(func.sum(Product.current_preorders).desc()).limit(5).all()
+    top_categories = sorted(
+        (c for c in categories if c.active_products > 0),
+        key=lambda c: c.active_preorders,
+        reverse=True
+    )[:5]
     
     return {
         "total_products": total_products,
@@ -40,55 +59,87 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
         "active_campaigns": active_campaigns,
         "top_categories": [
             {
-                "category": cat[0],
-                "products": cat[1],
-                "preorders": int(cat[2] or 0)
+                "category": cat.category or None,
+                "products": cat.active_products,
+                "preorders": int(cat.active_preorders)
             }
             for cat in top_categories
         ]
     }
 
+TRENDING_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.current_preorders,
+    Product.target_quantity,
+    Product.savings_percentage,
+)
+
 @router.get("/trending")
-async def get_trending_products(limit: int = 10, db: Session = Depends(get_db)):
+async def get_trending_products(request: Request, limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
     """Get trending products based on preorder velocity"""
     
-    products = db.query(Product).filter(
-        Product.is_active == True
-    ).order_by(Product.current_preorders.desc()).limit(limit).all()
+    async def load():
+        # Top-K by decayed preorder rate, resolved by primary key
+        ranked = velocity.top_products()
+        products = []
+        if ranked:
+            result = await db.execute(select(*TRENDING_COLUMNS).where(
+                Product.id.in_(ranked),
+                Product.is_active == True
+            ))
+            by_id = {row.id: row._asdict() for row in result.all()}
+            products = [by_id[i] for i in ranked if i in by_id][:limit]
+        
+        if len(products) < limit:
+            # Cold start: pad with the largest clusters
+            query = select(*TRENDING_COLUMNS).filter(Product.is_active == True)
+            if products:
+                query = query.filter(Product.id.notin_([p["id"] for p in products]))
+            result = await db.execute(
+                query.order_by(Product.current_preorders.desc()).limit(limit - len(products))
+            )
+            products += [row._asdict() for row in result.all()]
+        
+        products = await counters.apply_pending_records(db, products)
+        now = time.time()
+        
+        for p in products:
+            p["progress_percentage"] = round((p["current_preorders"] / p["target_quantity"]) * 100, 1)
+            p["velocity_per_hour"] = round(velocity.velocity(p["id"], now), 2)
+            p["preorders_last_hour"] = velocity.window_total(p["id"], 60, now)
+        return {"trending": products}
     
-    return {
-        "trending": [
-            {
-                "id": p.id,
-                "name": p.name,
-                "current_preorders": p.current_preorders,
-                "target_quantity": p.target_quantity,
-                "progress_percentage": round((p.current_preorders / p.target_quantity) * 100, 1),
-                "savings_percentage": p.savings_percentage
-            }
-            for p in products
-        ]
-    }
+    return await response_cache.respond(request, [cache.PRODUCTS], load)
 
 @router.get("/price-impact")
-async def get_price_impact_analysis(db: Session = Depends(get_db)):
+async def get_price_impact_analysis(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Analyze tariff impact across categories"""
     
-    impact_data = db.query(
-        Product.category,
-        func.avg(Product.tariff_impact).label('avg_tariff'),
-        func.avg(Product.savings_percentage).label('avg_savings')
-    ).filter(
-        Product.is_active == True
-    ).group_by(Product.category).all()
+    async def load():
+        categories = await rollups.load(db)
+        
+        return {
+            "categories": [
+                {
+                    "category": data.category or None,
+                    "avg_tariff_impact": round(data.tariff_sum / data.tariff_count, 2) if data.tariff_count else 0.0,
+                    "avg_savings": round(data.savings_pct_sum / data.savings_pct_count, 2) if data.savings_pct_count else 0.0
+                }
+                for data in sorted(categories, key=lambda c: c.category)
+                if data.active_products > 0
+            ]
+        }
     
-    return {
-        "categories": [
-            {
-                "category": data[0],
-                "avg_tariff_impact": round(float(data[1] or 0), 2),
-                "avg_savings": round(float(data[2] or 0), 2)
-            }
-            for data in impact_data
-        ]
-    }
\ No newline at end of file
+    return await response_cache.respond(request, [cache.CATALOG], load)
+
+@router.post("/tariff-scenarios")
+async def simulate_tariff_scenarios(body: TariffSimulation, db: AsyncSession = Depends(get_read_db)):
+    """What-if tariff schedules over the whole catalog and open preorders"""
+    snapshot = await snapshots.get(db)
+    return await asyncio.to_thread(
+        snapshot.simulate,
+        [s.model_dump() for s in body.scenarios],
+        body.by_category,
+        body.top_products,
+    )
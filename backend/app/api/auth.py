@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models.user import User
+from app.services.identity import identity_cache
 
 router = APIRouter()
 
@@ -21,10 +24,10 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 @router.post("/register", response_model=UserResponse)
-async def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register_user(user_data: UserRegister, db: AsyncSession = Depends(get_db)):
     """Issue a new Registered Network Identity"""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await identity_cache.lookup(db, user_data.email)
     if existing_user:
         return existing_user
     
@@ -37,14 +40,30 @@ async def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # The cache can miss an email registered moments ago; the unique index is authoritative
+        await db.rollback()
+        result = await db.execute(select(User).filter(User.email == user_data.email))
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise
+    else:
+        await db.refresh(db_user)
+    # Replaces any negative entry for this email
+    await identity_cache.remember(db_user)
     return db_user
 
 @router.get("/check/{email}", response_model=UserResponse)
-async def check_identity(email: str, db: Session = Depends(get_db)):
+async def check_identity(email: str, db: AsyncSession = Depends(get_read_db)):
     """Verify if an identity is registered in the protocol"""
-    user = db.query(User).filter(User.email == email).first()
+    user = await identity_cache.lookup(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="Identity not registered")
     return user
+
+@router.get("/identity/metrics")
+async def identity_metrics():
+    """Identity cache and Bloom filter hit rates for this worker"""
+    return identity_cache.metrics()
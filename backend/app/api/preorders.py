@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, EmailStr, ValidationError
+from typing import List, Optional
+import json
+from app.api.products import PRODUCT_ROWS, ProductResponse
 from app.core.database import get_db
 from app.models.product import Product, Preorder
+from app.core import cache
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.serialization import RowSchema, json_response
+from app.services import counters, rollups, settlement
+from app.services.trending import velocity
+from app.services.write_buffer import preorder_buffer
 from datetime import datetime
 
 router = APIRouter()
 
+MAX_BULK_PREORDERS = 5000
+
 # Schemas
 class PreorderCreate(BaseModel):
     product_id: int
@@ -26,21 +38,48 @@ class PreorderResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class PreorderWithProduct(PreorderResponse):
+    product: Optional[ProductResponse] = None
+
+PREORDER_ROWS = RowSchema(PreorderResponse, Preorder)
+
+class BulkPreorderResult(BaseModel):
+    index: int
+    status: str  # created, rejected
+    preorder: Optional[PreorderResponse] = None
+    detail: Optional[str] = None
+
 @router.post("/", response_model=PreorderResponse)
 async def create_preorder(
     preorder: PreorderCreate,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new preorder"""
-    # Check if product exists
-    product = db.query(Product).filter(Product.id == preorder.product_id).first()
+    buffered = settings.PREORDER_WRITE_BUFFER and preorder_buffer.running
+    # Check if product exists; the buffer locks it again when it flushes the batch
+    if buffered:
+        product = await db.get(Product, preorder.product_id)
+    else:
+        product = (await settlement.lock_clusters(db, [preorder.product_id])).get(preorder.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    if not product.is_active:
+    if not settlement.accepts_preorders(product):
         raise HTTPException(status_code=400, detail="Product is not available for preorder")
     
+    if buffered:
+        # Group commit: returns once the batch holding this row is durable
+        created = await preorder_buffer.submit({
+            "product_id": preorder.product_id,
+            "user_email": preorder.user_email,
+            "quantity": preorder.quantity,
+            "price_locked": product.group_buy_price,
+        })
+        if created is None:
+            raise HTTPException(status_code=400, detail="Product is not available for preorder")
+        return created
+    
     # Create preorder
     db_preorder = Preorder(
         product_id=preorder.product_id,
@@ -49,28 +88,135 @@ async def create_preorder(
         price_locked=product.group_buy_price
     )
     
-    # Update product preorder count
-    product.current_preorders += preorder.quantity
-    
     db.add(db_preorder)
-    db.commit()
-    db.refresh(db_preorder)
+    await rollups.record_preorders(db, [{
+        "user_email": preorder.user_email,
+        "quantity": preorder.quantity,
+        "price_locked": product.group_buy_price,
+    }])
+    
+    # Atomic server-side increment, no read-modify-write on the product row
+    await counters.increment(db, product.id, preorder.quantity)
+    
+    await db.commit()
+    await db.refresh(db_preorder)
+    velocity.record(product.id, preorder.quantity)
+    await response_cache.invalidate(cache.PRODUCTS)
     
     # TODO: Add background task for email notification
     # background_tasks.add_task(send_preorder_confirmation, preorder.user_email)
     
     return db_preorder
 
-@router.get("/user/{email}", response_model=List[PreorderResponse])
-async def get_user_preorders(email: str, db: Session = Depends(get_db)):
-    """Get all preorders for a user"""
-    preorders = db.query(Preorder).filter(Preorder.user_email == email).all()
-    return preorders
+@router.post("/bulk", response_model=List[BulkPreorderResult], openapi_extra={
+    "requestBody": {
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": PreorderCreate.model_json_schema()}},
+            "application/x-ndjson": {"schema": {"type": "string"}},
+        },
+        "required": True,
+    }
+})
+async def create_preorders_bulk(request: Request, db: AsyncSession = Depends(get_db)):
+    """Create many preorders at once from a JSON list or an NDJSON body"""
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            raw_items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            raw_items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed request body")
+    if not isinstance(raw_items, list):
+        raise HTTPException(status_code=400, detail="Expected a list of preorders")
+    if len(raw_items) > MAX_BULK_PREORDERS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_PREORDERS} preorders per request")
+    
+    results = [BulkPreorderResult(index=i, status="rejected") for i in range(len(raw_items))]
+    items = {}
+    for i, raw in enumerate(raw_items):
+        try:
+            items[i] = PreorderCreate.model_validate(raw)
+        except ValidationError as e:
+            results[i].detail = str(e.errors()[0]["msg"])
+    
+    # Resolve and lock every referenced product in one query
+    product_ids = {item.product_id for item in items.values()}
+    products = {}
+    if product_ids:
+        products = await settlement.lock_clusters(db, product_ids)
+    
+    rows, accepted, deltas = [], [], {}
+    for i, item in items.items():
+        product = products.get(item.product_id)
+        if not product:
+            results[i].detail = "Product not found"
+            continue
+        if not settlement.accepts_preorders(product):
+            results[i].detail = "Product is not available for preorder"
+            continue
+        rows.append({
+            "product_id": item.product_id,
+            "user_email": item.user_email,
+            "quantity": item.quantity,
+            "price_locked": product.group_buy_price,
+        })
+        accepted.append(i)
+        deltas[item.product_id] = deltas.get(item.product_id, 0) + item.quantity
+    
+    if rows:
+        # One multi-row INSERT plus one counter UPDATE for the whole batch
+        created = await db.scalars(
+            insert(Preorder).returning(Preorder, sort_by_parameter_order=True),
+            rows,
+        )
+        for i, db_preorder in zip(accepted, created.all()):
+            results[i].status = "created"
+            results[i].preorder = PreorderResponse.model_validate(db_preorder)
+        await counters.increment_many(db, deltas)
+        await rollups.record_preorders(db, rows)
+        await db.commit()
+        velocity.record_many(deltas)
+        await response_cache.invalidate(cache.PRODUCTS)
+    
+    return results
+
+@router.get("/buffer/metrics")
+async def get_buffer_metrics():
+    """Group-commit write buffer throughput and batching stats"""
+    return preorder_buffer.metrics()
+
+@router.get("/user/{email}", response_model=List[PreorderWithProduct])
+async def get_user_preorders(
+    email: str,
+    expand: Optional[str] = Query(None, enum=["product"], description="Embed each preorder's product"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get all preorders for a user; `expand=product` joins in the products in the same query"""
+    if expand != "product":
+        result = await db.execute(select(*PREORDER_ROWS.columns).filter(Preorder.user_email == email))
+        return json_response(PREORDER_ROWS.records(result.all()))
+    
+    width = len(PREORDER_ROWS.columns)
+    result = await db.execute(
+        select(*PREORDER_ROWS.columns, *PRODUCT_ROWS.columns)
+        .outerjoin(Preorder.product)
+        .filter(Preorder.user_email == email)
+    )
+    rows = result.all()
+    preorders = PREORDER_ROWS.records(row[:width] for row in rows)
+    product_id = width + PRODUCT_ROWS.fields.index("id")
+    distinct = {row[product_id]: row[width:] for row in rows if row[product_id] is not None}
+    products = await counters.apply_pending_records(db, PRODUCT_ROWS.records(distinct.values()))
+    by_id = {p["id"]: p for p in products}
+    for preorder in preorders:
+        preorder["product"] = by_id.get(preorder["product_id"])
+    return json_response(preorders)
 
 @router.get("/{preorder_id}", response_model=PreorderResponse)
-async def get_preorder(preorder_id: int, db: Session = Depends(get_db)):
+async def get_preorder(preorder_id: int, db: AsyncSession = Depends(get_db)):
     """Get single preorder by ID"""
-    preorder = db.query(Preorder).filter(Preorder.id == preorder_id).first()
+    preorder = await db.get(Preorder, preorder_id)
     if not preorder:
         raise HTTPException(status_code=404, detail="Preorder not found")
     return preorder
\ No newline at end of file
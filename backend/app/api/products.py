@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from app.core.database import get_db
+from datetime import datetime, timedelta
+from app.core import cache, conditional
+from app.core.cache import response_cache
+from app.core.database import get_db, get_read_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.serialization import RowSchema
 from app.models.product import Product
+from app.services import counters, price_history, rollups, search
 
 router = APIRouter()
 
@@ -33,36 +39,174 @@ class ProductResponse(ProductBase):
     sourced_from: str | None
     deadline: datetime | None
     created_at: datetime
+    price_trend: dict | None = None
+    price_forecast: dict | None = None
+    settlement_status: str | None = None
     
     class Config:
         from_attributes = True
 
+PRODUCT_ROWS = RowSchema(ProductResponse, Product)
+MAX_BATCH_IDS = 500
+
+class SearchResult(ProductResponse):
+    score: float
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchResult]
+    suggestions: List[str]
+
+class PriceObservationCreate(BaseModel):
+    product_id: int
+    price: float
+    source: str = "manual"
+    observed_at: datetime | None = None
+
 @router.get("/", response_model=List[ProductResponse])
 async def get_products(
+    request: Request,
     skip: int = 0,
-    limit: int = 20,
+    limit: int = Query(20, ge=1, le=500),
     category: str | None = None,
-    db: Session = Depends(get_db)
+    sort: str = Query("oldest", enum=["oldest", "newest"]),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all active products with optional filtering"""
-    query = db.query(Product).filter(Product.is_active == True)
+    """Get all active products with optional filtering.
+    Pass the X-Next-Cursor header back as `cursor` for stable keyset paging;
+    `skip` still works but degrades with depth."""
+    async def load():
+        # Core rows straight to JSON; hydrating ORM objects dominated large pages
+        query = select(*PRODUCT_ROWS.columns).filter(Product.is_active == True)
+        
+        if category:
+            query = query.filter(Product.category == category)
+        
+        # ids are assigned in insertion order, so they double as a stable creation-time key
+        newest = sort == "newest"
+        query = query.order_by(Product.id.desc() if newest else Product.id)
+        if cursor:
+            (last_id,) = decode_cursor(cursor, int)
+            query = query.filter(Product.id < last_id if newest else Product.id > last_id)
+        elif skip:
+            query = query.offset(skip)
+        
+        result = await db.execute(query.limit(limit))
+        products = await counters.apply_pending_records(db, PRODUCT_ROWS.records(result.all()))
+        headers = {"X-Next-Cursor": encode_cursor(products[-1]["id"])} if len(products) == limit else {}
+        return products, headers
     
-    if category:
-        query = query.filter(Product.category == category)
+    return await response_cache.respond(request, [cache.PRODUCTS], load)
+
+@router.get("/search", response_model=SearchResponse)
+async def search_products(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    category: str | None = None,
+    skip: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Full-text search over active products with prefix matching.
+    Relevance is blended with savings and preorder momentum; `suggestions`
+    holds respelled queries when there are few matches."""
+    async def load():
+        found = await search.search(db, q, category, limit, skip)
+        products = await counters.apply_pending(db, [p for p, _ in found["results"]])
+        return {
+            "query": q,
+            "results": [
+                {**ProductResponse.model_validate(p).model_dump(mode="json"), "score": score}
+                for p, (_, score) in zip(products, found["results"])
+            ],
+            "suggestions": found["suggestions"],
+        }
     
-    products = query.offset(skip).limit(limit).all()
-    return products
+    return await response_cache.respond(request, [cache.PRODUCTS], load)
+
+@router.get("/batch", response_model=List[ProductResponse])
+async def get_products_batch(
+    request: Request,
+    ids: str = Query(..., description=f"Comma-separated product ids, at most {MAX_BATCH_IDS}"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Resolve many products in one round-trip, in the order asked; unknown ids are skipped"""
+    try:
+        wanted = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(wanted) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    
+    async def load():
+        result = await db.execute(select(*PRODUCT_ROWS.columns).where(Product.id.in_(wanted)))
+        products = await counters.apply_pending_records(db, PRODUCT_ROWS.records(result.all()))
+        by_id = {p["id"]: p for p in products}
+        return [by_id[i] for i in wanted if i in by_id]
+    
+    return await response_cache.respond(request, [cache.PRODUCTS], load)
 
 @router.get("/{product_id}", response_model=ProductResponse)
-async def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Get single product by ID"""
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+async def get_product(product_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    """Get single product by ID.
+    Revalidation with If-None-Match/If-Modified-Since costs one narrow row read."""
+    result = await db.execute(
+        select(Product.updated_at, Product.created_at, Product.current_preorders).where(Product.id == product_id)
+    )
+    version = result.first()
+    if version is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    pending = (await counters.pending_counts(db, [product_id])).get(product_id, 0)
+    modified = version.updated_at or version.created_at
+    # current_preorders too: SQLite's now() only has second resolution
+    etag = conditional.etag_of(f"{product_id}:{modified}:{version.current_preorders}:{pending}".encode())
+    if conditional.not_modified(request, etag, modified):
+        return conditional.not_modified_response(etag, modified)
+    
+    product = await db.get(Product, product_id)
+    await counters.apply_pending(db, [product])
+    response.headers.update(conditional.validator_headers(etag, modified))
     return product
 
+@router.get("/{product_id}/price-history")
+async def get_price_history(
+    product_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    resolution: str = Query("auto", enum=["auto", "raw", "hour", "day"]),
+    limit: int = Query(5000, ge=1, le=20000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Price history for a range, served from raw points or hourly/daily OHLC buckets"""
+    if not await db.get(Product, product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    # Naive times are UTC; normalize before comparing them with the aware default
+    end = price_history.utc(end)
+    start = price_history.utc(start) if start else end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return await price_history.history(db, product_id, start, end, resolution, limit)
+
+@router.post("/price-observations")
+async def append_price_observations(
+    observations: List[PriceObservationCreate],
+    db: AsyncSession = Depends(get_db)
+):
+    """Bulk-append price observations"""
+    ids = {o.product_id for o in observations}
+    if ids:
+        result = await db.execute(select(Product.id).where(Product.id.in_(ids)))
+        missing = ids - set(result.scalars().all())
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Products not found: {sorted(missing)}")
+    appended = await price_history.append(db, [o.model_dump() for o in observations])
+    await db.commit()
+    await response_cache.invalidate(cache.PRODUCTS)
+    return {"appended": appended}
+
 @router.post("/", response_model=ProductResponse)
-async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_db)):
     """Create new product"""
     savings = ((product.retail_price - product.group_buy_price) / product.retail_price) * 100
     
@@ -71,12 +215,19 @@ async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
         savings_percentage=round(savings, 2)
     )
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await db.flush()
+    await rollups.record_products_created(db, [db_product])
+    await db.commit()
+    await db.refresh(db_product)
+    search.index.mark_stale()
+    await response_cache.invalidate(cache.PRODUCTS, cache.CATALOG, cache.CATEGORIES)
     return db_product
 
 @router.get("/categories/list")
-async def get_categories(db: Session = Depends(get_db)):
+async def get_categories(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get all product categories"""
-    categories = db.query(Product.category).distinct().all()
-    return {"categories": [cat[0] for cat in categories if cat[0]]}
\ No newline at end of file
+    async def load():
+        result = await db.execute(select(Product.category).distinct())
+        return {"categories": [cat[0] for cat in result.all() if cat[0]]}
+    
+    return await response_cache.respond(request, [cache.CATEGORIES], load)
\ No newline at end of file
@@ -1,65 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import cache
+from app.core.cache import response_cache
 from app.core.database import get_db
 from app.models.product import Product
+from app.models.sourcing import SourcingJob
+from app.services import rollups, search
+from app.services.deal_finder import CATEGORIES, runner
 from pydantic import BaseModel
-import random
+from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter()
 
 class SourcingStatus(BaseModel):
     deals_found: int
     status: str
+    job_id: Optional[str] = None
 
-async def simulate_ai_sourcing(db: Session):
-    """
-    Simulates AI crawling for inflation arbitrage.
-    In a real app, this would use the search_web tool and LLM.
-    """
-    categories = ["Electronics", "Home", "Outdoors", "Healthcare", "Food"]
-    products = [
-        {"name": "Industrial Grade Solar Inverter", "retail": 1200, "group": 850, "cat": "Electronics"},
-        {"name": "Bulk HEPA Filter Nodes", "retail": 45, "group": 22, "cat": "Home"},
-        {"name": "Autonomous Irrigation Node", "retail": 850, "group": 600, "cat": "Outdoors"},
-        {"name": "Protocol-Grade Medical Supplies", "retail": 250, "group": 140, "cat": "Healthcare"},
-        {"name": "Preserved Strategic Grain Cluster", "retail": 500, "group": 300, "cat": "Food"}
-    ]
-    
-    # Pick 2-3 random products to 'find'
-    found_deals = random.sample(products, random.randint(2, 3))
-    
-    for deal in found_deals:
-        savings = ((deal["retail"] - deal["group"]) / deal["retail"]) * 100
-        new_deal = Product(
-            name=deal["name"],
-            description=f"AI Sourced: Arbitrage opportunity found in the {deal['cat']} sector.",
-            category=deal["cat"],
-            retail_price=deal["retail"],
-            group_buy_price=deal["group"],
-            savings_percentage=round(savings, 2),
-            sourced_from="ai_finder",
-            is_approved=False, # Requires Admin Review
-            is_active=False    # Inactive until approved
-        )
-        db.add(new_deal)
+class SourcingJobResponse(BaseModel):
+    id: str
+    status: str
+    categories: List[str]
+    deals_found: int
+    inserted: int
+    updated: int
+    fetch_errors: int
+    error: Optional[str]
+    created_at: Optional[datetime]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
     
-    db.commit()
-    print(f"AI Sourcing Complete: Found {len(found_deals)} clusters.")
+    class Config:
+        from_attributes = True
 
 @router.post("/find-deals", response_model=SourcingStatus)
-async def trigger_sourcing(background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def trigger_sourcing(categories: Optional[List[str]] = Query(None)):
     """Trigger the AI Deal Finder protocol"""
-    background_tasks.add_task(simulate_ai_sourcing, db)
-    return {"deals_found": 0, "status": "AI Sourcing Protocol Initiated"}
+    unknown = set(categories or []) - set(CATEGORIES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown categories: {', '.join(sorted(unknown))}")
+    job = await runner.submit(categories)
+    return {"deals_found": 0, "status": "AI Sourcing Protocol Initiated", "job_id": job.id}
+
+@router.get("/jobs/{job_id}", response_model=SourcingJobResponse)
+async def get_sourcing_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    """Poll an AI Deal Finder job"""
+    job = await db.get(SourcingJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.patch("/approve/{product_id}")
-async def approve_deal(product_id: int, db: Session = Depends(get_db)):
+async def approve_deal(product_id: int, db: AsyncSession = Depends(get_db)):
     """Approve and activate an AI-found deal"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Node not found")
     
+    # Settlement never revisits a cluster, so reopening one would strand its new preorders
+    if product.settlement_status is not None:
+        raise HTTPException(status_code=409, detail=f"Cluster already {product.settlement_status}")
+    
+    await rollups.record_activation(db, product, True)
     product.is_approved = True
     product.is_active = True
-    db.commit()
+    await db.commit()
+    search.index.mark_stale()
+    await response_cache.invalidate(cache.PRODUCTS, cache.CATALOG)
     return {"message": f"Deal '{product.name}' activated on live marketplace."}
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.services.progress import hub
+
+router = APIRouter()
+
+MAX_STREAM_IDS = 200
+
+@router.get("/clusters")
+async def stream_clusters(ids: str | None = Query(None, description="Comma-separated product ids; all clusters if omitted")):
+    """Server-Sent Events: coalesced current_preorders/progress updates as preorders commit"""
+    wanted = None
+    if ids:
+        try:
+            wanted = {int(i) for i in ids.split(",") if i.strip()}
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if len(wanted) > MAX_STREAM_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_STREAM_IDS} ids per stream")
+    subscriber = hub.subscribe(wanted)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        hub.events(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/metrics")
+async def stream_metrics():
+    """Subscriber count and fan-out stats for this worker"""
+    return hub.metrics()
@@ -0,0 +1,230 @@
+"""
+Shared response cache.
+
+Entries are keyed by route + query params and stamped with the versions
+of the tags they depend on; invalidating a tag bumps its version, so every
+entry carrying the old version misses on its next read. Redis is used
+when reachable (CACHE_BACKEND = "auto" or "redis"), otherwise an
+in-process LRU with TTL. Concurrent misses on one key share a single
+recompute.
+
+respond() caches the encoded JSON body. A small validator entry (tag
+versions and ETag) sits beside it, so a conditional request that still
+matches gets a 304 from one lookup. The body is never read and nothing is
+serialized. There is no Last-Modified: the time an entry was stored says
+nothing about when its data changed, so only the ETag decides.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from fastapi import Request, Response
+from app.core import conditional, serialization
+from app.core.config import settings
+
+TAG_PREFIX = "cache:tag:"
+BODY_PREFIX = "cache:body:"
+VALIDATOR_PREFIX = "cache:validator:"
+
+# Tags
+PRODUCTS = "products"      # anything touching products, incl. preorder counts
+CATALOG = "catalog"        # product set or product attributes
+CATEGORIES = "categories"  # distinct category names
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.counters: Dict[str, int] = {}
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            if key in self.counters:
+                values.append(str(self.counters[key]))
+                continue
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= now:
+                self.entries.pop(key, None)
+                values.append(None)
+                continue
+            self.entries.move_to_end(key)
+            values.append(entry[1])
+        return values
+
+    async def set(self, key: str, value: str, ttl: float):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def incr(self, key: str):
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    async def delete(self, key: str):
+        self.entries.pop(key, None)
+
+    async def close(self):
+        pass
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        values = await self.client.mget(keys)
+        return [v.decode() if isinstance(v, bytes) else v for v in values]
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self.client.set(key, value, px=int(ttl * 1000))
+
+    async def incr(self, key: str):
+        await self.client.incr(key)
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def close(self):
+        await self.client.aclose()
+
+async def connect_redis(url: str) -> Optional[RedisBackend]:
+    try:
+        from redis import asyncio as aioredis
+    except ImportError:
+        return None
+    client = aioredis.from_url(url, socket_connect_timeout=1)
+    try:
+        await client.ping()
+    except Exception:
+        await client.aclose()
+        return None
+    return RedisBackend(client)
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = MemoryBackend(settings.CACHE_MAX_ENTRIES)
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "errors": 0, "not_modified": 0}
+
+    async def connect(self):
+        """Pick the backend; called from the app lifespan"""
+        mode = settings.CACHE_BACKEND
+        if mode in ("auto", "redis"):
+            backend = await connect_redis(settings.REDIS_URL)
+            if backend is not None:
+                self.backend = backend
+            elif mode == "redis":
+                print("Redis unavailable, response cache falling back to in-process LRU")
+
+    async def close(self):
+        await self.backend.close()
+
+    async def respond(
+        self,
+        request: Request,
+        tags: Sequence[str],
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Response:
+        """
+        Cached JSON response with an ETag, or 304 when the client's copy is current.
+        compute returns the payload, or (payload, extra headers).
+        """
+        if settings.CACHE_BACKEND == "none":
+            return self._send(request, encode_body(await compute()))
+
+        key = request_key(request)
+        tag_keys = [TAG_PREFIX + tag for tag in tags]
+        try:
+            if conditional.is_conditional(request):
+                marker, *versions = await self.backend.get_many([VALIDATOR_PREFIX + key] + tag_keys)
+                if marker is not None:
+                    signature, etag = marker.split("|", 1)
+                    if signature == _signature(versions) and conditional.not_modified(request, etag):
+                        self.stats["not_modified"] += 1
+                        return conditional.not_modified_response(etag)
+            raw, *versions = await self.backend.get_many([BODY_PREFIX + key] + tag_keys)
+        except Exception:
+            self.stats["errors"] += 1
+            return self._send(request, encode_body(await compute()))
+        signature = _signature(versions)
+
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry["s"] == signature:
+                self.stats["hits"] += 1
+                return self._send(request, entry)
+        self.stats["misses"] += 1
+
+        inflight_key = BODY_PREFIX + key
+        task = self.inflight.get(inflight_key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return self._send(request, await asyncio.shield(task))
+
+        async def recompute():
+            entry = encode_body(await compute())
+            entry["s"] = signature
+            try:
+                ttl_seconds = ttl or settings.CACHE_TTL_SECONDS
+                await self.backend.set(BODY_PREFIX + key, json.dumps(entry), ttl_seconds)
+                await self.backend.set(
+                    VALIDATOR_PREFIX + key, f"{signature}|{entry['e']}", ttl_seconds
+                )
+            except Exception:
+                self.stats["errors"] += 1
+            return entry
+
+        task = asyncio.ensure_future(recompute())
+        self.inflight[inflight_key] = task
+        task.add_done_callback(lambda _: self.inflight.pop(inflight_key, None))
+        return self._send(request, await asyncio.shield(task))
+
+    def _send(self, request: Request, entry: dict) -> Response:
+        if conditional.not_modified(request, entry["e"]):
+            self.stats["not_modified"] += 1
+            return conditional.not_modified_response(entry["e"])
+        return Response(
+            content=entry["b"],
+            media_type="application/json",
+            headers={**entry["h"], **conditional.validator_headers(entry["e"])},
+        )
+
+    async def invalidate(self, *tags: str):
+        for tag in tags:
+            try:
+                await self.backend.incr(TAG_PREFIX + tag)
+                self.stats["invalidations"] += 1
+            except Exception:
+                self.stats["errors"] += 1
+
+    def metrics(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "backend": self.backend.name,
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "inflight": len(self.inflight),
+        }
+
+def _signature(versions: Sequence[Optional[str]]) -> str:
+    return ",".join(str(int(v or 0)) for v in versions)
+
+def encode_body(result: Any) -> dict:
+    """Serialize once and hash the bytes for the ETag"""
+    payload, headers = result if isinstance(result, tuple) else (result, {})
+    body = serialization.dumps(payload)
+    return {"b": body.decode(), "e": conditional.etag_of(body), "h": headers}
+
+def request_key(request: Request) -> str:
+    """Route path plus sorted query params"""
+    params = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{params}"
+
+response_cache = ResponseCache()
@@ -0,0 +1,94 @@
+"""
+Response compression for JSON and text bodies.
+
+CompressionMiddleware is plain ASGI and only touches single-shot bodies
+(one http.response.body message), so SSE streams and CSV exports pass
+through untouched. Brotli is used when the brotli package is installed
+and the client accepts it, gzip otherwise. Bodies under
+COMPRESSION_MIN_BYTES, non-200 responses and anything already encoded
+are left alone. A strong ETag gets the coding appended ("-gzip", "-br"),
+which conditional.not_modified ignores when matching.
+"""
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ("application/json", "text/")
+
+def _accepted(accept_encoding: str) -> set:
+    codings = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            if name.strip() == "q" and float(value) == 0:
+                continue  # Explicitly refused
+        except ValueError:
+            continue
+        codings.add(coding.strip())
+    return codings
+
+def choose_coding(accept_encoding: str):
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        coding = choose_coding(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_wrapper(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    message["status"] == 200
+                    and "content-encoding" not in headers
+                    and content_type.startswith(COMPRESSIBLE)
+                    and not content_type.startswith("text/event-stream")
+                ):
+                    start = message  # Hold until we see whether the body is single-shot
+                    return
+                await send(message)
+            elif start is not None:
+                held, start = start, None
+                body = message.get("body", b"")
+                if not message.get("more_body", False) and len(body) >= settings.COMPRESSION_MIN_BYTES:
+                    body = compress(body, coding)
+                    headers = MutableHeaders(raw=held["headers"])
+                    headers["Content-Encoding"] = coding
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    etag = headers.get("etag")
+                    if etag and etag.endswith('"') and not etag.startswith("W/"):
+                        headers["ETag"] = f'{etag[:-1]}-{coding}"'
+                    message = {**message, "body": body}
+                await send(held)
+                await send(message)
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,67 @@
+"""
+HTTP validators: strong ETags, Last-Modified and 304 Not Modified.
+
+ETags are content or version hashes. CompressionMiddleware suffixes them
+with the coding it applied ("-gzip", "-br") so each representation has
+its own strong tag; matching ignores that suffix.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request, Response
+
+CODING_SUFFIXES = ("-gzip", "-br")
+
+def etag_of(data: bytes) -> str:
+    return '"' + hashlib.blake2b(data, digest_size=12).hexdigest() + '"'
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in CODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+def _epoch(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+def http_date(value) -> str:
+    return format_datetime(datetime.fromtimestamp(int(_epoch(value)), timezone.utc), usegmt=True)
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+def not_modified(request: Request, etag: str, modified=None) -> bool:
+    """If-None-Match when present (it takes precedence), else If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+    if_modified_since = request.headers.get("if-modified-since")
+    modified = _epoch(modified)
+    if if_modified_since and modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(modified) <= _epoch(since)
+    return False
+
+def validator_headers(etag: str, modified=None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = http_date(modified)
+    return headers
+
+def not_modified_response(etag: str, modified=None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, modified))
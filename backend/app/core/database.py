@@ -1,17 +1,131 @@
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+from typing import List, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+# Async drivers used when the configured URL names the sync one
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver equivalent"""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+def pool_options(url: str) -> dict:
+    """Pool sizing for server databases; SQLite keeps SQLAlchemy's own pool choice"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def make_sessionmaker(bind) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+# Sync engine for scripts (init_db, seed_data, reset_db)
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API so DB round-trips don't block the event loop
+async_engine = create_async_engine(to_async_url(settings.DATABASE_URL), **pool_options(settings.DATABASE_URL))
+AsyncSessionLocal = make_sessionmaker(async_engine)
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_async_engine(to_async_url(url), **pool_options(url))
+        self.sessionmaker = make_sessionmaker(self.engine)
+        self.healthy = True
+
+class ReadRouter:
+    """
+    Round-robins read-only sessions across healthy replicas, falling back
+    to the primary when none are. Replicas are marked down on connection
+    errors and restored by the periodic health check. Replicas lag the
+    primary, so reads that must see the caller's own writes stay on get_db.
+    """
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(f"replica{i}", url) for i, url in enumerate(urls)]
+        self.turn = itertools.count()
+
+    def pick(self) -> Optional[Replica]:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self.turn) % len(healthy)]
+
+    def session(self) -> AsyncSession:
+        replica = self.pick()
+        return (replica.sessionmaker if replica else AsyncSessionLocal)()
+
+    async def check(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                await asyncio.wait_for(conn.execute(text("SELECT 1")), settings.REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS)
+        except Exception as e:
+            if replica.healthy:
+                print(f"Read replica {replica.name} marked down: {e}")
+            replica.healthy = False
+        else:
+            if not replica.healthy:
+                print(f"Read replica {replica.name} back up")
+            replica.healthy = True
+
+    async def run_health_checks(self):
+        """Periodic replica probe; started from the app lifespan"""
+        while True:
+            await asyncio.gather(*(self.check(r) for r in self.replicas))
+            await asyncio.sleep(settings.REPLICA_HEALTH_CHECK_INTERVAL_SECONDS)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+read_router = ReadRouter(settings.DATABASE_READ_REPLICA_URLS)
+
 Base = declarative_base()
 
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+def upsert_insert(db: AsyncSession, model):
+    """Dialect-specific INSERT that supports ON CONFLICT clauses"""
+    return DIALECT_INSERTS[db.bind.dialect.name](model)
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def get_read_db():
+    """Session on a read replica (or the primary) for read-only routes"""
+    replica = read_router.pick()
+    async with (replica.sessionmaker if replica else AsyncSessionLocal)() as db:
+        try:
+            yield db
+        except DBAPIError as e:
+            # Connection-level failure: stop routing here until the health check passes
+            if replica is not None and (e.connection_invalidated or isinstance(e, OperationalError)):
+                replica.healthy = False
+            raise
@@ -0,0 +1,272 @@
+"""
+Request and database instrumentation, exposed in Prometheus text format.
+
+MetricsMiddleware is plain ASGI, so streamed bodies are timed to their
+last chunk. It tracks per-route latency, in-flight requests and status
+counts. SQLAlchemy engine events attribute every statement to the route
+whose request issued it, via a context variable: statement count and DB
+time per request, per-statement latency, and slow statements (at least
+SLOW_QUERY_MS) logged with their route. Pool checkout wait is timed
+around Pool.connect.
+
+Metrics are plain dicts of counters, updated on the event loop thread,
+so the hot path is one perf_counter() pair and a bisect per observation.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in self.values.items()
+        ]
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), collect: Optional[Callable[[], Dict[tuple, float]]] = None):
+        super().__init__(name, help, labels)
+        self.values: Dict[tuple, float] = {}
+        self.collect = collect
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def render(self) -> List[str]:
+        values = self.collect() if self.collect else self.values
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in values.items()
+        ]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self.series: Dict[tuple, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total[0])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+))
+request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route")
+))
+in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests currently being served"))
+request_statements = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements issued per request", ("route",), COUNT_BUCKETS
+))
+request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds", "Total SQL time per request", ("route",)
+))
+statement_seconds = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement latency by issuing route", ("route",)
+))
+slow_statements = registry.register(Counter(
+    "db_slow_statements_total", "SQL statements slower than SLOW_QUERY_MS", ("route",)
+))
+checkout_seconds = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("engine",)
+))
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds", "done")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.done = False
+
+    @property
+    def route(self) -> str:
+        return route_of(self.scope)
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+_route_paths: Dict[Callable, str] = {}
+
+def route_of(scope: dict) -> str:
+    """Path template of the matched route; never the raw path, to bound label cardinality"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        for route in getattr(app, "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                path = route.path
+                break
+        _route_paths[endpoint] = path = path or "unmatched"
+    return path
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+        in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            stats.done = True
+            current_request.reset(token)
+            route = stats.route
+            method = scope["method"]
+            requests_total.inc(method, route, str(status))
+            request_seconds.observe(elapsed, method, route)
+            request_statements.observe(stats.statements, route)
+            request_db_seconds.observe(stats.db_seconds, route)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    stats = current_request.get()
+    if stats is not None and stats.done:
+        stats = None  # Task spawned by a request that has since finished
+    route = stats.route if stats else "background"
+    if stats:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+    statement_seconds.observe(elapsed, route)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        slow_statements.inc(route)
+        print(f"Slow query ({elapsed * 1000:.0f} ms) from {route}: {' '.join(statement.split())[:500]}")
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+def instrument_engine(engine: Engine, name: str = "primary"):
+    """Attach statement timing and pool checkout timing to a (sync) engine"""
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            checkout_seconds.observe(time.perf_counter() - started, name)
+
+    pool.connect = timed_connect
+    _engines[name] = engine
+
+_engines: Dict[str, Engine] = {}
+
+def _pool_checked_out() -> Dict[tuple, float]:
+    return {
+        (name,): engine.pool.checkedout()
+        for name, engine in _engines.items()
+        if hasattr(engine.pool, "checkedout")
+    }
+
+registry.register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out", ("engine",), collect=_pool_checked_out
+))
@@ -0,0 +1,25 @@
+import base64
+import json
+from typing import Any, List
+from fastapi import HTTPException
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque keyset cursor over the sort key of the last row on a page"""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types: type) -> List[Any]:
+    """Values of a cursor, one per expected type; anything else is a 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(types):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    for value, expected in zip(values, types):
+        # JSON has one number type; bool is an int subclass
+        allowed = (int, float) if expected is float else expected
+        if isinstance(value, bool) or not isinstance(value, allowed):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
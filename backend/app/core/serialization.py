@@ -0,0 +1,92 @@
+"""
+ORM-free JSON for hot list endpoints.
+
+RowSchema is compiled once from a response model and an ORM class: the
+columns to select (only the fields the model exposes), the field order,
+and converters for fields whose column type differs from the model's
+(e.g. Numeric into float). Rows come back from Core as plain tuples and
+go straight to JSON bytes, skipping identity-map hydration and
+per-object Pydantic validation.
+
+dumps() uses orjson when it is installed and falls back to the standard
+library. Datetimes are written the way Pydantic writes them (ISO 8601,
+"Z" for UTC) so both paths produce the same payloads.
+"""
+import json
+import types
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union, get_args, get_origin
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        payload, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode()
+
+def json_response(payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _scalar_type(annotation) -> Any:
+    """float for `float | None`, etc."""
+    if get_origin(annotation) in (Union, types.UnionType):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return args[0] if len(args) == 1 else None
+    return annotation
+
+def _python_type(column) -> Any:
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+class RowSchema:
+    """Selectable columns plus an encoder for one response model"""
+
+    def __init__(self, model: Type[BaseModel], entity, exclude: Sequence[str] = ()):
+        self.fields: List[str] = []
+        self.columns = []
+        self.defaults: Dict[str, Any] = {}
+        self.converters: List[Tuple[int, Callable]] = []
+        for name, field in model.model_fields.items():
+            if name in exclude:
+                continue
+            column = getattr(entity, name, None)
+            if column is None:
+                self.defaults[name] = field.get_default(call_default_factory=True)
+                continue
+            wanted = _scalar_type(field.annotation)
+            if wanted in (float, int) and _python_type(column) is not wanted:
+                self.converters.append((len(self.fields), wanted))
+            self.fields.append(name)
+            self.columns.append(column)
+
+    def records(self, rows: Iterable[Sequence]) -> List[dict]:
+        fields, defaults, converters = self.fields, self.defaults, self.converters
+        records = []
+        for row in rows:
+            record = dict(zip(fields, row))
+            for index, convert in converters:
+                value = row[index]
+                if value is not None:
+                    record[fields[index]] = convert(value)
+            if defaults:
+                record.update(defaults)
+            records.append(record)
+        return records
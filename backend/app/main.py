@@ -1,14 +1,65 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import products, preorders, analytics, auth, sourcing, admin_registry
+from fastapi.responses import PlainTextResponse
+from app.api import products, preorders, analytics, auth, sourcing, admin_registry, stream
+from app.core import metrics
+from app.core.compression import CompressionMiddleware
+from app.core.cache import response_cache
 from app.core.config import settings
+from app.core.database import async_engine, read_router
+from app.services import counters
+from app.services import archive, forecasting, price_history, settlement, trending
+from app.services.deal_finder import runner as sourcing_runner
+from app.services.identity import identity_cache
+from app.services.progress import hub as progress_hub
+from app.services.write_buffer import preorder_buffer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await response_cache.connect()
+    await identity_cache.start()
+    try:
+        await trending.warm_up(trending.velocity, settings.TRENDING_WARMUP_HOURS)
+    except Exception as e:
+        print(f"Trending warm-up skipped: {e}")
+    tasks = []
+    if settings.PREORDER_COUNTER_SHARDS > 0:
+        tasks.append(asyncio.create_task(counters.run_compaction_loop()))
+    tasks.append(asyncio.create_task(price_history.run_retention_loop()))
+    if read_router.replicas:
+        tasks.append(asyncio.create_task(read_router.run_health_checks()))
+    if settings.FORECAST_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(forecasting.run_forecast_loop()))
+    if settings.SETTLEMENT_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(settlement.run_settlement_loop()))
+    tasks.append(asyncio.create_task(archive.run_maintenance_loop()))
+    if settings.PREORDER_WRITE_BUFFER:
+        preorder_buffer.start()
+    sourcing_runner.start()
+    await progress_hub.start()
+    yield
+    await progress_hub.stop()
+    await sourcing_runner.stop()
+    await preorder_buffer.stop()
+    settlement.stop()
+    for task in tasks:
+        task.cancel()
+    # Let cancelled loops unwind while their engines are still open
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await response_cache.close()
+    await identity_cache.stop()
+    await read_router.dispose()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Inflation Shield API",
     description="AI-Driven Marketplace API for Group-Buy Price Optimization",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -18,8 +69,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(async_engine.sync_engine)
+    for replica in read_router.replicas:
+        metrics.instrument_engine(replica.engine.sync_engine, replica.name)
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(products.router, prefix="/api/products", tags=["Products"])
 app.include_router(preorders.router, prefix="/api/preorders", tags=["Preorders"])
@@ -27,6 +88,7 @@ app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"]
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(sourcing.router, prefix="/api/sourcing", tags=["Sourcing"])
 app.include_router(admin_registry.router, prefix="/api/admin", tags=["Admin"])
+app.include_router(stream.router, prefix="/api/stream", tags=["Stream"])
 
 @app.get("/")
 async def root():
@@ -38,4 +100,13 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "inflation-shield-api"}
\ No newline at end of file
+    return {"status": "healthy", "service": "inflation-shield-api"}
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of request, SQL and pool metrics"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/cache/metrics")
+async def cache_metrics():
+    return response_cache.metrics()
\ No newline at end of file
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class CategoryRollup(Base):
+    """Incrementally maintained per-category aggregates for the analytics endpoints"""
+    __tablename__ = "category_rollups"
+
+    category = Column(String, primary_key=True)  # "" holds uncategorised products
+    
+    # Active products only
+    active_products = Column(Integer, nullable=False, default=0)
+    active_campaigns = Column(Integer, nullable=False, default=0)
+    active_preorders = Column(Integer, nullable=False, default=0)
+    tariff_sum = Column(Float, nullable=False, default=0.0)
+    tariff_count = Column(Integer, nullable=False, default=0)
+    savings_pct_sum = Column(Float, nullable=False, default=0.0)
+    savings_pct_count = Column(Integer, nullable=False, default=0)
+    
+    # All products / all preorders
+    preorder_units = Column(Integer, nullable=False, default=0)
+    savings_total = Column(Float, nullable=False, default=0.0)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UserRollup(Base):
+    """Incrementally maintained preorder totals per email, for the admin registry and user exports"""
+    __tablename__ = "user_rollups"
+
+    user_email = Column(String, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    # Whole cents, so registry cursors compare exactly
+    spent_cents = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class PreorderArchiveFile(Base):
+    """One cold-storage file written by the archival job; rows are gone from preorders"""
+    __tablename__ = "preorder_archive_files"
+
+    id = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False, unique=True)  # relative to PREORDER_ARCHIVE_DIR
+    rows = Column(Integer, nullable=False)
+    first_id = Column(Integer, nullable=False)
+    last_id = Column(Integer, nullable=False)
+    created_from = Column(DateTime(timezone=True))
+    created_to = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class PreorderArchiveUserTotal(Base):
+    """Archived preorders per user, added back into the registry and user exports"""
+    __tablename__ = "preorder_archive_user_totals"
+
+    user_email = Column(String, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=False, default=0.0)
+
+class PreorderArchiveProductTotal(Base):
+    """Archived units per product, added back into rollup rebuilds and tariff exposure"""
+    __tablename__ = "preorder_archive_product_totals"
+
+    product_id = Column(Integer, primary_key=True)
+    units = Column(Integer, nullable=False, default=0)  # not cancelled
+    open_units = Column(Integer, nullable=False, default=0)  # pending or confirmed
+    locked_units = Column(Integer, nullable=False, default=0)  # open, with price_locked
+    locked_value = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, BigInteger, Index
+from app.core.database import Base
+
+class PriceObservation(Base):
+    """Raw price points, kept for PRICE_RAW_RETENTION_DAYS"""
+    __tablename__ = "price_observations"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    product_id = Column(Integer, nullable=False)
+    source = Column(String, nullable=False, default="manual")
+    observed_at = Column(DateTime(timezone=True), nullable=False)
+    price = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_price_observations_product_time", "product_id", "observed_at"),
+    )
+
+class PriceBucket(Base):
+    """OHLC rollups of price_observations at hourly and daily resolution"""
+    __tablename__ = "price_buckets"
+
+    product_id = Column(Integer, primary_key=True)
+    resolution = Column(String, primary_key=True)  # hour, day
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    
+    # Times of the open/close observations, so late or out-of-order appends merge correctly
+    first_at = Column(DateTime(timezone=True), nullable=False)
+    last_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,7 +1,20 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, JSON
-from sqlalchemy.sql import func
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, DateTime, Boolean, Text, JSON, Index, PrimaryKeyConstraint
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func, literal_column
 from app.core.database import Base
 
+def search_document(name, description):
+    """
+    Weighted tsvector over name (A) and description (B). Constants are inlined
+    so queries repeat the exact expression the GIN index was built on.
+    """
+    config = literal_column("'english'::regconfig")
+    empty = literal_column("''")
+    return func.setweight(func.to_tsvector(config, func.coalesce(name, empty)), literal_column("'A'")).op("||")(
+        func.setweight(func.to_tsvector(config, func.coalesce(description, empty)), literal_column("'B'"))
+    )
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -18,6 +31,8 @@ class Product(Base):
     
     # AI Analysis
     price_trend = Column(JSON)  # Store AI-predicted price movements
+    price_forecast = Column(JSON)
+    forecasted_at = Column(DateTime(timezone=True), index=True)  # NULL = new observations since last forecast
     tariff_impact = Column(Float, default=0.0)
     savings_percentage = Column(Float)
     
@@ -27,20 +42,71 @@ class Product(Base):
     is_active = Column(Boolean, default=True)
     is_approved = Column(Boolean, default=True) # AI deals start as false
     sourced_from = Column(String, default="manual") # manual, ai_finder
+    fingerprint = Column(String, unique=True, index=True) # normalized name|supplier, set for sourced deals
     deadline = Column(DateTime)
     
+    # Settlement: NULL -> confirming/cancelling (claimed) -> succeeded/failed
+    settlement_status = Column(String)
+    settlement_claimed_at = Column(DateTime(timezone=True))
+    settled_at = Column(DateTime(timezone=True))
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Clusters can hold far more preorders than belong in memory; query them instead
+    preorders = relationship("Preorder", back_populates="product", lazy="raise", passive_deletes=True)
+
+    __table_args__ = (
+        # Keyset paging over the catalog, with and without a category filter
+        Index("ix_products_active_category_id", "is_active", "category", "id"),
+        # Settlement sweeper: open clusters by deadline
+        Index(
+            "ix_products_open_deadline", "deadline",
+            postgresql_where=(is_active == True) & (settlement_status == None),
+            sqlite_where=(is_active == True) & (settlement_status == None),
+        ),
+        # Full-text search; other databases use the in-process index in services/search.py
+        Index(
+            "ix_products_search", search_document(name, description), postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
+
 class Preorder(Base):
     __tablename__ = "preorders"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     user_email = Column(String, index=True)
     quantity = Column(Integer, default=1)
     price_locked = Column(Float)
     status = Column(String, default="pending")  # pending, confirmed, completed, cancelled
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Load explicitly (join / selectinload); an implicit lazy load can't run under AsyncSession
+    product = relationship("Product", back_populates="preorders", lazy="raise")
+
+    __table_args__ = (
+        # Settlement walks one cluster's pending preorders in id order
+        Index("ix_preorders_product_status_id", "product_id", "status", "id"),
+        # Monthly range partitions on PostgreSQL (services/partitions.py); a plain table elsewhere
+        {"postgresql_partition_by": "RANGE (created_at)", "info": {"partition_key": "created_at"}},
+    )
+
+@compiles(PrimaryKeyConstraint, "postgresql")
+def _primary_key_with_partition_key(constraint, compiler, **kw):
+    """PostgreSQL requires a partitioned table's primary key to include the partition key"""
+    ddl = compiler.visit_primary_key_constraint(constraint, **kw)
+    key = constraint.table.info.get("partition_key")
+    if key and key not in constraint.columns and ddl.endswith(")"):
+        ddl = f"{ddl[:-1]}, {compiler.preparer.quote(key)})"
+    return ddl
+
+class ProductCounterShard(Base):
+    """Striped preorder counter rows, summed on read and compacted into products"""
+    __tablename__ = "product_counter_shards"
+
+    product_id = Column(Integer, primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class SourcingJob(Base):
+    __tablename__ = "sourcing_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    status = Column(String, default="queued", index=True)  # queued, running, completed, failed
+    categories = Column(JSON)
+    
+    # Results
+    deals_found = Column(Integer, default=0)
+    inserted = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    fetch_errors = Column(Integer, default=0)
+    error = Column(Text)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
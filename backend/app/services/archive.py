@@ -0,0 +1,200 @@
+"""
+Archival of settled preorders to cold storage.
+
+Preorders of clusters that finished settlement (succeeded or failed),
+created more than PREORDER_ARCHIVE_AFTER_DAYS ago, are moved out of the
+preorders table PREORDER_ARCHIVE_BATCH_ROWS at a time. Each batch is
+written as a gzip CSV file under PREORDER_ARCHIVE_DIR, in the columns of
+the preorders export, and fsynced. Then one transaction deletes the rows,
+records the file in preorder_archive_files and adds the rows to the
+archived totals. If that transaction fails the file is removed again
+(unless the commit may have landed after all), so every row is either in
+the table or in a recorded file.
+
+Aggregates over preorder rows add the archived totals back in:
+rollups.user_totals() when user_rollups are rebuilt,
+rollups.compute for rebuilt preorder_units, and the tariff snapshot for
+open units. current_preorders and user_rollups are maintained counters, so
+archival never touches them.
+
+The maintenance loop also keeps the monthly partitions ahead of time
+(services/partitions.py) and drops the old ones archival has emptied.
+"""
+import asyncio
+import gzip
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, async_engine, upsert_insert
+from app.models.archive import PreorderArchiveFile, PreorderArchiveProductTotal, PreorderArchiveUserTotal
+from app.models.product import Preorder, Product
+from app.services import exports, partitions, rollups, settlement, tariffs
+
+COLUMNS = (
+    Preorder.id, Preorder.product_id, Preorder.user_email, Preorder.quantity,
+    Preorder.price_locked, Preorder.status, Preorder.created_at, Preorder.updated_at,
+)
+UPSERT_CHUNK = 1000
+
+def cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=settings.PREORDER_ARCHIVE_AFTER_DAYS)
+
+def write_file(path: str, rows: List[tuple]):
+    """gzip CSV, fsynced and renamed into place"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + ".partial"
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+            out.write(exports.encode_csv([c.key for c in COLUMNS], rows, True).encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+
+def _totals(rows: List[tuple]):
+    users: Dict[str, list] = {}
+    products: Dict[int, list] = {}
+    for _, product_id, email, quantity, price, status, _, _ in rows:
+        quantity = quantity or 0
+        if email is not None:
+            user = users.setdefault(email, [0, 0])
+            user[0] += 1
+            user[1] += rollups.cents(price, quantity)
+        if product_id is not None:
+            product = products.setdefault(product_id, [0, 0, 0, 0.0])
+            if status != "cancelled":
+                product[0] += quantity
+            if status in tariffs.OPEN_STATUSES:
+                product[1] += quantity
+                if price is not None:
+                    product[2] += quantity
+                    product[3] += price * quantity
+    return users, products
+
+async def add_totals(db: AsyncSession, rows: List[tuple]):
+    users, products = _totals(rows)
+    user_rows = [
+        {"user_email": email, "order_count": count, "total_spent": spent / 100}
+        for email, (count, spent) in users.items()
+    ]
+    product_rows = [
+        {"product_id": pid, "units": units, "open_units": open_units, "locked_units": locked, "locked_value": value}
+        for pid, (units, open_units, locked, value) in products.items()
+    ]
+    for model, key, measures, values in (
+        (PreorderArchiveUserTotal, "user_email", ("order_count", "total_spent"), user_rows),
+        (PreorderArchiveProductTotal, "product_id", ("units", "open_units", "locked_units", "locked_value"), product_rows),
+    ):
+        for start in range(0, len(values), UPSERT_CHUNK):
+            stmt = upsert_insert(db, model).values(values[start:start + UPSERT_CHUNK])
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[key],
+                set_={m: getattr(model, m) + getattr(stmt.excluded, m) for m in measures},
+            ))
+
+async def archive_batch(db: AsyncSession, before: datetime, limit: int) -> int:
+    """Move one batch of settled preorders to a file; returns rows moved"""
+    result = await db.execute(
+        select(*COLUMNS)
+        .join(Product, Product.id == Preorder.product_id)
+        .where(
+            Product.settlement_status.in_((settlement.SUCCEEDED, settlement.FAILED)),
+            Preorder.status != "pending",
+            Preorder.created_at < before,
+        )
+        .order_by(Preorder.id)
+        .limit(limit)
+        .with_for_update(of=Preorder, skip_locked=True)
+    )
+    rows = [tuple(row) for row in result.all()]
+    if not rows:
+        return 0
+
+    created = [row[6] for row in rows if row[6] is not None]
+    first, last = rows[0][0], rows[-1][0]
+    month = min(created).strftime("%Y-%m") if created else "undated"
+    relative = os.path.join("preorders", month, f"preorders-{first:010d}-{last:010d}.csv.gz")
+    path = os.path.join(settings.PREORDER_ARCHIVE_DIR, relative)
+    await asyncio.to_thread(write_file, path, rows)
+
+    try:
+        await db.execute(delete(Preorder).where(Preorder.id.in_([row[0] for row in rows])))
+        await add_totals(db, rows)
+        await db.execute(insert(PreorderArchiveFile).values(
+            path=relative, rows=len(rows), first_id=first, last_id=last,
+            created_from=min(created) if created else None,
+            created_to=max(created) if created else None,
+        ))
+        await db.commit()
+    except BaseException:
+        await db.rollback()
+        await discard_unrecorded(relative, path)
+        raise
+    return len(rows)
+
+async def discard_unrecorded(relative: str, path: str):
+    """Remove a file whose batch didn't commit; keep it if the commit may have landed after all"""
+    try:
+        async with AsyncSessionLocal() as db:
+            recorded = await db.scalar(select(PreorderArchiveFile.id).where(PreorderArchiveFile.path == relative))
+    except Exception:
+        return
+    if recorded is None:
+        os.remove(path)
+
+async def run_archive(max_batches: int = 0) -> Dict[str, int]:
+    """Archive everything due (or at most max_batches batches); one transaction per batch"""
+    stats = {"batches": 0, "rows": 0}
+    if settings.PREORDER_ARCHIVE_AFTER_DAYS <= 0:
+        return stats
+    before = cutoff()
+    while not max_batches or stats["batches"] < max_batches:
+        async with AsyncSessionLocal() as db:
+            moved = await archive_batch(db, before, settings.PREORDER_ARCHIVE_BATCH_ROWS)
+        if not moved:
+            break
+        stats["batches"] += 1
+        stats["rows"] += moved
+    return stats
+
+async def maintain() -> Dict[str, object]:
+    """Create upcoming partitions, archive, then drop emptied partitions"""
+    async with async_engine.begin() as conn:
+        created = await conn.run_sync(partitions.ensure)
+    stats = await run_archive()
+    dropped = []
+    if settings.PREORDER_ARCHIVE_AFTER_DAYS > 0:
+        async with async_engine.begin() as conn:
+            dropped = await conn.run_sync(partitions.drop_empty_before, cutoff())
+    return {**stats, "partitions_created": created, "partitions_dropped": dropped}
+
+async def run_maintenance_loop():
+    """Partition upkeep and archival every PREORDER_MAINTENANCE_INTERVAL_SECONDS; started from the app lifespan"""
+    while True:
+        try:
+            stats = await maintain()
+            if stats["rows"] or stats["partitions_created"] or stats["partitions_dropped"]:
+                print(f"Preorder maintenance: archived {stats['rows']} rows, "
+                      f"created {stats['partitions_created']}, dropped {stats['partitions_dropped']}")
+        except Exception as e:
+            if asyncio.current_task().cancelling():
+                break
+            print(f"Preorder maintenance failed: {e}")
+        await asyncio.sleep(settings.PREORDER_MAINTENANCE_INTERVAL_SECONDS)
+
+async def status(db: AsyncSession) -> dict:
+    files = await db.execute(select(func.count(PreorderArchiveFile.id), func.sum(PreorderArchiveFile.rows)))
+    count, rows = files.one()
+    conn = await db.connection()
+    return {
+        "archive_dir": settings.PREORDER_ARCHIVE_DIR,
+        "archive_after_days": settings.PREORDER_ARCHIVE_AFTER_DAYS,
+        "files": count or 0,
+        "archived_rows": int(rows or 0),
+        "partitions": [
+            {"name": name, "estimated_rows": estimated}
+            for name, estimated in await conn.run_sync(partitions.describe)
+        ],
+    }
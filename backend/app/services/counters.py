@@ -0,0 +1,144 @@
+"""
+Preorder counter subsystem for Product.current_preorders.
+
+With PREORDER_COUNTER_SHARDS = 0 every increment is a single atomic
+server-side UPDATE. With N > 0 increments are spread over N striped rows
+per product so a hot cluster doesn't queue on one row lock; reads add the
+pending shard totals and a periodic compaction folds them into products.
+"""
+import asyncio
+import random
+from typing import Dict, Iterable, List
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core import cache
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, upsert_insert
+from app.models.product import Product, ProductCounterShard
+from app.services import progress, rollups, settlement
+
+def preorders_total():
+    """SQL for a product's preorder count, including shard rows not yet compacted"""
+    total = func.coalesce(Product.current_preorders, 0)
+    if settings.PREORDER_COUNTER_SHARDS <= 0:
+        return total
+    pending = (
+        select(func.coalesce(func.sum(ProductCounterShard.count), 0))
+        .where(ProductCounterShard.product_id == Product.id)
+        .scalar_subquery()
+    )
+    return total + pending
+
+async def increment(db: AsyncSession, product_id: int, delta: int):
+    """Add delta to a product's preorder count inside the caller's transaction"""
+    await increment_many(db, {product_id: delta})
+
+async def add_to_products(db: AsyncSession, deltas: Dict[int, int]):
+    """Add deltas straight onto products.current_preorders with one UPDATE"""
+    result = await db.execute(
+        update(Product)
+        .where(Product.id.in_(sorted(deltas)))
+        .values(current_preorders=func.coalesce(Product.current_preorders, 0)
+                + case(deltas, value=Product.id, else_=0))
+        .returning(
+            Product.id, Product.category, Product.is_active, Product.current_preorders,
+            Product.retail_price, Product.group_buy_price, Product.target_quantity,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await rollups.record_counter_changes(db, rows, deltas)
+    progress.stage(db, rows)
+    settlement.notify_reached(
+        row.id for row in rows
+        if row.is_active and row.target_quantity is not None and (row.current_preorders or 0) >= row.target_quantity
+    )
+
+async def increment_many(db: AsyncSession, deltas: Dict[int, int]):
+    """Apply per-product deltas in a single statement"""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    ids = sorted(deltas)
+    shards = settings.PREORDER_COUNTER_SHARDS
+    if shards <= 0:
+        await add_to_products(db, deltas)
+        return
+    # One shard per product per statement, so no row is hit twice
+    stmt = upsert_insert(db, ProductCounterShard).values([
+        {"product_id": product_id, "shard": random.randrange(shards), "count": deltas[product_id]}
+        for product_id in ids
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["product_id", "shard"],
+        set_={"count": ProductCounterShard.count + stmt.excluded.count},
+    ))
+
+async def pending_counts(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Uncompacted shard totals per product"""
+    ids = list(product_ids)
+    if settings.PREORDER_COUNTER_SHARDS <= 0 or not ids:
+        return {}
+    result = await db.execute(
+        select(ProductCounterShard.product_id, func.sum(ProductCounterShard.count))
+        .where(ProductCounterShard.product_id.in_(ids))
+        .group_by(ProductCounterShard.product_id)
+    )
+    return {product_id: int(total or 0) for product_id, total in result.all()}
+
+async def apply_pending(db: AsyncSession, products: Iterable[Product]):
+    """Fold pending shard totals into loaded products without dirtying them"""
+    products = list(products)
+    pending = await pending_counts(db, (p.id for p in products))
+    for product in products:
+        if product.id in pending:
+            set_committed_value(
+                product,
+                "current_preorders",
+                (product.current_preorders or 0) + pending[product.id],
+            )
+    return products
+
+async def apply_pending_records(db: AsyncSession, records: List[dict]) -> List[dict]:
+    """apply_pending for Core rows already turned into dicts"""
+    pending = await pending_counts(db, (r["id"] for r in records))
+    if pending:
+        for record in records:
+            if record["id"] in pending:
+                record["current_preorders"] = (record["current_preorders"] or 0) + pending[record["id"]]
+    return records
+
+async def compact(db: AsyncSession) -> int:
+    """
+    Move shard totals into products.current_preorders.
+    DELETE ... RETURNING claims exactly the rows it folds, so increments
+    racing with compaction land in fresh shard rows and are never lost.
+    """
+    result = await db.execute(
+        delete(ProductCounterShard).returning(
+            ProductCounterShard.product_id, ProductCounterShard.count
+        )
+    )
+    totals: Dict[int, int] = {}
+    for product_id, count in result.all():
+        totals[product_id] = totals.get(product_id, 0) + count
+    if totals:
+        await add_to_products(db, totals)
+    await db.commit()
+    if totals:
+        await response_cache.invalidate(cache.PRODUCTS)
+    return len(totals)
+
+async def run_compaction_loop():
+    """Periodically compact shard rows; started from the app lifespan"""
+    while True:
+        await asyncio.sleep(settings.COUNTER_COMPACTION_INTERVAL_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await compact(db)
+        except Exception as e:
+            if asyncio.current_task().cancelling():
+                break
+            print(f"Counter compaction failed: {e}")
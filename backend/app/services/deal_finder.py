@@ -0,0 +1,253 @@
+"""
+AI deal finder job subsystem.
+
+Sourcing runs as jobs with ids and a persisted status row. A bounded
+pool of SOURCING_WORKERS workers runs them, and each worker opens its
+own sessions. A job fans out across (category, supplier) pairs
+concurrently through a pluggable fetcher. Requests share one pooled
+HTTP client and are rate-limited per supplier. Found deals are bulk
+upserted, deduplicated on a normalized name|supplier fingerprint.
+"""
+import asyncio
+import random
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Protocol
+import httpx
+from sqlalchemy import select
+from app.core import cache
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, upsert_insert
+from app.models.product import Product
+from app.models.sourcing import SourcingJob
+from app.services import price_history
+
+CATEGORIES = ["Electronics", "Home", "Outdoors", "Healthcare", "Food"]
+
+SUPPLIERS = [
+    {"name": "Shenzhen Direct Manufacturing", "country": "CN"},
+    {"name": "Lagos Wholesale Exchange", "country": "NG"},
+    {"name": "Rotterdam Bulk Terminal", "country": "NL"},
+]
+
+def fingerprint(name: str, supplier: str) -> str:
+    """Case, punctuation and whitespace-insensitive identity of a deal"""
+    def normalize(value: str) -> str:
+        return " ".join(re.sub(r"[^a-z0-9]+", " ", (value or "").lower()).split())
+    return f"{normalize(name)}|{normalize(supplier)}"
+
+class DealFetcher(Protocol):
+    async def fetch(self, client: httpx.AsyncClient, category: str, supplier: dict) -> List[dict]:
+        """Return deals as dicts with name, retail, group and category keys"""
+        ...
+
+class SimulatedFetcher:
+    """
+    Simulates AI crawling for inflation arbitrage.
+    In a real app, this would use the search_web tool and LLM.
+    """
+    catalog = [
+        {"name": "Industrial Grade Solar Inverter", "retail": 1200, "group": 850, "cat": "Electronics"},
+        {"name": "Bulk HEPA Filter Nodes", "retail": 45, "group": 22, "cat": "Home"},
+        {"name": "Autonomous Irrigation Node", "retail": 850, "group": 600, "cat": "Outdoors"},
+        {"name": "Protocol-Grade Medical Supplies", "retail": 250, "group": 140, "cat": "Healthcare"},
+        {"name": "Preserved Strategic Grain Cluster", "retail": 500, "group": 300, "cat": "Food"}
+    ]
+
+    async def fetch(self, client, category, supplier):
+        await asyncio.sleep(random.uniform(0.05, 0.2))
+        return [
+            {"name": d["name"], "retail": d["retail"], "group": d["group"], "category": d["cat"]}
+            for d in self.catalog
+            if d["cat"] == category and random.random() < 0.5
+        ]
+
+class FeedFetcher:
+    """Pulls deals from a JSON feed at SOURCING_FEED_URL"""
+    def __init__(self, url: str):
+        self.url = url
+
+    async def fetch(self, client, category, supplier):
+        response = await client.get(self.url, params={"category": category, "supplier": supplier["name"]})
+        response.raise_for_status()
+        return response.json()
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart"""
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        async with self.lock:
+            now = loop.time()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class SourcingJobRunner:
+    def __init__(self, workers: int, fetcher: Optional[DealFetcher] = None):
+        self.workers = workers
+        self.fetcher = fetcher or (
+            FeedFetcher(settings.SOURCING_FEED_URL) if settings.SOURCING_FEED_URL else SimulatedFetcher()
+        )
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.tasks: List[asyncio.Task] = []
+        self.client: Optional[httpx.AsyncClient] = None
+        self.limiters: Dict[str, RateLimiter] = {}
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self.tasks)
+
+    def start(self):
+        if self.running:
+            return
+        self.client = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=settings.SOURCING_MAX_CONNECTIONS),
+        )
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def submit(self, categories: Optional[List[str]] = None) -> SourcingJob:
+        job = SourcingJob(id=uuid.uuid4().hex, status="queued", categories=categories or CATEGORIES)
+        async with AsyncSessionLocal() as db:
+            db.add(job)
+            await db.commit()
+        self.start()
+        await self.queue.put(job.id)
+        return job
+
+    async def worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self.run_job(job_id)
+            except Exception as e:
+                print(f"Sourcing job {job_id} crashed: {e}")
+
+    async def run_job(self, job_id: str):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(SourcingJob, job_id)
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+            await db.commit()
+
+            try:
+                deals, errors = await self.fan_out(job.categories)
+                inserted, updated = await self.upsert(deals)
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Interrupted by shutdown"
+                job.finished_at = datetime.now(timezone.utc)
+                await db.commit()
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            else:
+                job.status = "completed"
+                job.deals_found = len(deals)
+                job.inserted = inserted
+                job.updated = updated
+                job.fetch_errors = errors
+            job.finished_at = datetime.now(timezone.utc)
+            await db.commit()
+        print(f"AI Sourcing job {job_id} {job.status}: found {job.deals_found} clusters.")
+
+    async def fetch_one(self, category: str, supplier: dict) -> List[dict]:
+        limiter = self.limiters.setdefault(
+            supplier["name"], RateLimiter(settings.SOURCING_RATE_LIMIT_PER_SECOND)
+        )
+        await limiter.wait()
+        deals = await self.fetcher.fetch(self.client, category, supplier)
+        return [{**deal, "supplier": supplier} for deal in deals]
+
+    async def fan_out(self, categories: List[str]):
+        results = await asyncio.gather(
+            *(self.fetch_one(c, s) for c in categories for s in SUPPLIERS),
+            return_exceptions=True,
+        )
+        deals = {}
+        errors = 0
+        for result in results:
+            if isinstance(result, Exception):
+                errors += 1
+                continue
+            for deal in result:
+                # Dedup within the job before touching the database
+                deals[fingerprint(deal["name"], deal["supplier"]["name"])] = deal
+        return deals, errors
+
+    async def upsert(self, deals: Dict[str, dict]):
+        """
+        Insert new deals and refresh prices of ones still awaiting review,
+        in one statement. Approved deals are never repriced by sourcing.
+        New and unreviewed deals are inactive with no preorders, so they
+        don't contribute to the analytics rollups.
+        """
+        if not deals:
+            return 0, 0
+        rows = []
+        for key, deal in deals.items():
+            savings = ((deal["retail"] - deal["group"]) / deal["retail"]) * 100
+            rows.append({
+                "name": deal["name"],
+                "description": f"AI Sourced: Arbitrage opportunity found in the {deal['category']} sector.",
+                "category": deal["category"],
+                "retail_price": deal["retail"],
+                "group_buy_price": deal["group"],
+                "savings_percentage": round(savings, 2),
+                "supplier_info": deal["supplier"],
+                "sourced_from": "ai_finder",
+                "is_approved": False, # Requires Admin Review
+                "is_active": False,   # Inactive until approved
+                "fingerprint": key,
+            })
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Product.fingerprint, Product.is_approved)
+                .where(Product.fingerprint.in_(list(deals)))
+            )
+            existing = dict(result.all())
+            stmt = upsert_insert(db, Product).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["fingerprint"],
+                set_={
+                    "retail_price": stmt.excluded.retail_price,
+                    "group_buy_price": stmt.excluded.group_buy_price,
+                    "savings_percentage": stmt.excluded.savings_percentage,
+                    "supplier_info": stmt.excluded.supplier_info,
+                },
+                where=Product.is_approved == False,
+            )
+            result = await db.execute(stmt.returning(Product.id, Product.fingerprint))
+            
+            # Every sourced quote is also a price observation for its product
+            await price_history.append(db, [
+                {"product_id": product_id, "price": deals[key]["group"], "source": deals[key]["supplier"]["name"]}
+                for product_id, key in result.all()
+            ])
+            await db.commit()
+
+        inserted = len(deals) - len(existing)
+        if inserted:
+            await response_cache.invalidate(cache.CATEGORIES)
+        return inserted, sum(1 for approved in existing.values() if not approved)
+
+runner = SourcingJobRunner(settings.SOURCING_WORKERS)
@@ -0,0 +1,119 @@
+"""
+Streaming table exports for admin and finance reconciliation.
+
+Rows are read through a server-side cursor (AsyncSession.stream with
+yield_per). Each partition is encoded to CSV or NDJSON and, optionally,
+fed through an incremental gzip compressor, so memory stays constant
+whatever the table size. The generator opens its own read-replica
+session because the response body is sent after request dependencies
+have been closed.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import Float, cast, func, select
+from app.core.database import read_router
+from app.models.analytics import UserRollup
+from app.models.product import Preorder, Product
+from app.models.user import User
+
+EXPORT_BATCH_ROWS = 5000
+
+DATASETS = ("preorders", "users", "products")
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+STATUSES = {
+    "preorders": ("pending", "confirmed", "completed", "cancelled"),
+    "users": ("active", "inactive"),
+    "products": ("active", "inactive", "pending_review"),
+}
+
+def build_query(dataset: str, start: Optional[datetime], end: Optional[datetime], status: Optional[str]):
+    """Select for one dataset, ordered by id, with the date range and status filters applied"""
+    if dataset == "preorders":
+        query = select(
+            Preorder.id, Preorder.product_id, Preorder.user_email, Preorder.quantity,
+            Preorder.price_locked, Preorder.status, Preorder.created_at, Preorder.updated_at,
+        ).order_by(Preorder.id)
+        created = Preorder.created_at
+        if status:
+            query = query.where(Preorder.status == status)
+    elif dataset == "users":
+        query = select(
+            User.id, User.email, User.full_name, User.phone_number, User.is_active,
+            func.coalesce(UserRollup.order_count, 0).label("order_count"),
+            (cast(func.coalesce(UserRollup.spent_cents, 0), Float) / 100).label("total_spent"),
+            User.created_at,
+        ).outerjoin(UserRollup, UserRollup.user_email == User.email).order_by(User.id)
+        created = User.created_at
+        if status:
+            query = query.where(User.is_active == (status == "active"))
+    else:
+        query = select(
+            Product.id, Product.name, Product.category, Product.retail_price, Product.group_buy_price,
+            Product.savings_percentage, Product.tariff_impact, Product.target_quantity,
+            Product.current_preorders, Product.is_active, Product.is_approved, Product.sourced_from,
+            Product.supplier_info, Product.deadline, Product.created_at,
+        ).order_by(Product.id)
+        created = Product.created_at
+        if status == "pending_review":
+            query = query.where(Product.is_approved == False)
+        elif status:
+            query = query.where(Product.is_active == (status == "active"))
+
+    if start:
+        query = query.where(created >= start)
+    if end:
+        query = query.where(created < end)
+    return query
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _csv_cell(value):
+    value = _plain(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return "" if value is None else value
+
+def encode_csv(columns: List[str], rows, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_csv_cell(v) for v in row] for row in rows)
+    return buffer.getvalue()
+
+def encode_ndjson(columns: List[str], rows, header: bool) -> str:
+    return "".join(
+        json.dumps({c: _plain(v) for c, v in zip(columns, row)}, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+async def stream_rows(query, fmt: str, compress: bool = False) -> AsyncIterator[bytes]:
+    encode = encode_csv if fmt == "csv" else encode_ndjson
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    async with read_router.session() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        columns = list(result.keys())
+        first = True
+        async for partition in result.partitions():
+            chunk = encode(columns, partition, first).encode()
+            first = False
+            if gzip:
+                chunk = gzip.compress(chunk)
+            if chunk:
+                yield chunk
+        if first and fmt == "csv":
+            # Empty export still gets its header row
+            chunk = encode(columns, [], True).encode()
+            yield gzip.compress(chunk) if gzip else chunk
+    if gzip:
+        yield gzip.flush()
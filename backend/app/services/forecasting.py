@@ -0,0 +1,196 @@
+"""
+Catalog-wide price forecasting.
+
+Daily closes for every product are loaded into one (products x days)
+NumPy matrix with a validity mask. A linear trend plus weekly seasonality
+is fitted to all products in a single batched weighted least-squares
+solve, with no per-product Python loop. Results go into
+Product.price_forecast with chunked bulk UPDATEs. Incremental runs only
+pick up products that got new observations since their last forecast.
+A product is only marked forecast if its observation count in the window
+is unchanged since the load, so observations appended during a run are
+picked up by the next one.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import numpy as np
+from sqlalchemy import bindparam, case, func, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import cache
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.price_history import PriceBucket
+from app.models.product import Product
+
+WEEK = 7.0
+RIDGE = 1e-6
+UPDATE_CHUNK = 5000
+
+def design(days: np.ndarray, span: float) -> np.ndarray:
+    """Shared regressors: intercept, scaled trend, weekly sine/cosine"""
+    phase = 2 * np.pi * days / WEEK
+    return np.column_stack([np.ones_like(days), days / span, np.sin(phase), np.cos(phase)])
+
+def fit_forecasts(prices: np.ndarray, mask: np.ndarray, horizons=(7, 30), min_points: int = 3) -> Dict[str, np.ndarray]:
+    """
+    prices, mask: (P, T) arrays; mask marks observed days, column T-1 is today.
+    Returns per-product arrays; rows with fewer than min_points are NaN.
+    """
+    n_products, n_days = prices.shape
+    days = np.arange(n_days, dtype=np.float64)
+    span = float(max(n_days - 1, 1))
+    X = design(days, span)
+    W = mask.astype(np.float64)
+    Y = np.where(mask, prices, 0.0)
+
+    # Batched normal equations: A_p = X' W_p X, b_p = X' W_p y_p
+    A = np.einsum("pt,ti,tj->pij", W, X, X, optimize=True)
+    b = np.einsum("pt,ti->pi", W * Y, X, optimize=True)
+    A += RIDGE * np.eye(X.shape[1])
+    # Weekly terms are undetermined with under a week of data; damp them
+    counts = W.sum(axis=1)
+    short = counts < WEEK
+    A[short, 2, 2] += 1.0
+    A[short, 3, 3] += 1.0
+    beta = np.linalg.solve(A, b[..., None])[..., 0]
+
+    fitted = beta @ X.T
+    residual = np.where(mask, prices - fitted, 0.0)
+    dof = np.maximum(counts - X.shape[1], 1.0)
+    now_fit = beta @ design(np.array([span]), span)[0]
+
+    valid = counts >= min_points
+    out = {
+        "points": counts,
+        "current": np.where(valid, now_fit, np.nan),
+        "trend_pct_per_day": np.where(valid, beta[:, 1] / span / np.where(now_fit == 0, np.nan, now_fit) * 100, np.nan),
+        "seasonal_amplitude": np.where(valid, np.hypot(beta[:, 2], beta[:, 3]), np.nan),
+        "residual_std": np.where(valid, np.sqrt((residual ** 2).sum(axis=1) / dof), np.nan),
+    }
+    for h in horizons:
+        future = beta @ design(np.array([span + h]), span)[0]
+        out[f"forecast_{h}d"] = np.where(valid, future, np.nan)
+    return out
+
+def _day_number(db: AsyncSession, column):
+    """Whole days since the Unix epoch, computed in SQL so rows arrive as plain numbers"""
+    if db.bind.dialect.name == "postgresql":
+        return func.floor(func.extract("epoch", column) / 86400)
+    return func.julianday(column) - literal(2440587.5)
+
+def window_since(lookback_days: int) -> datetime:
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=lookback_days - 1)
+
+def _window(since: datetime):
+    return (PriceBucket.resolution == "day", PriceBucket.bucket_start >= since)
+
+async def load_matrix(db: AsyncSession, lookback_days: int, stale_only: bool, since: datetime):
+    """(product ids, prices, mask, observations per product) for the window starting at since"""
+    today_number = int(since.timestamp() // 86400) + lookback_days - 1
+
+    query = select(
+        PriceBucket.product_id,
+        _day_number(db, PriceBucket.bucket_start),
+        PriceBucket.close,
+        PriceBucket.count,
+    ).where(*_window(since))
+    if stale_only:
+        # price_history.append clears forecasted_at for products it touches
+        stale = select(Product.id).where(Product.forecasted_at.is_(None))
+        query = query.where(PriceBucket.product_id.in_(stale))
+
+    chunks = []
+    result = await db.stream(query.execution_options(yield_per=50000))
+    async for partition in result.partitions():
+        chunks.append(np.asarray(partition, dtype=np.float64))
+    if not chunks:
+        return (np.empty(0, dtype=np.int64), np.empty((0, lookback_days)),
+                np.zeros((0, lookback_days), dtype=bool), np.zeros(0, dtype=np.int64))
+
+    rows = np.concatenate(chunks)
+    product_ids, row_index = np.unique(rows[:, 0].astype(np.int64), return_inverse=True)
+    column = np.floor(rows[:, 1]).astype(np.int64) - (today_number - lookback_days + 1)
+    keep = (column >= 0) & (column < lookback_days)
+
+    prices = np.zeros((len(product_ids), lookback_days))
+    mask = np.zeros((len(product_ids), lookback_days), dtype=bool)
+    prices[row_index[keep], column[keep]] = rows[keep, 2]
+    mask[row_index[keep], column[keep]] = True
+    observations = np.bincount(row_index, weights=rows[:, 3], minlength=len(product_ids)).astype(np.int64)
+    return product_ids, prices, mask, observations
+
+def _clean(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+async def run(db: AsyncSession, full: bool = False) -> dict:
+    """Fit and store forecasts; incremental unless full"""
+    started = time.perf_counter()
+    since = window_since(settings.FORECAST_LOOKBACK_DAYS)
+    product_ids, prices, mask, observations = await load_matrix(
+        db, settings.FORECAST_LOOKBACK_DAYS, stale_only=not full, since=since
+    )
+    loaded = time.perf_counter()
+
+    results = await asyncio.to_thread(fit_forecasts, prices, mask)
+    fitted = time.perf_counter()
+
+    now = datetime.now(timezone.utc)
+    columns = {k: v for k, v in results.items() if k != "points"}
+    # Observations appended since the load change the count; leave those products stale
+    current = (
+        select(func.coalesce(func.sum(PriceBucket.count), 0))
+        .where(PriceBucket.product_id == Product.id, *_window(since))
+        .scalar_subquery()
+    )
+    products = Product.__table__
+    stmt = (
+        update(products)
+        .where(products.c.id == bindparam("product_id"))
+        .values(
+            price_forecast=bindparam("forecast"),
+            forecasted_at=case(
+                (current == bindparam("observations"), bindparam("stamp")),
+                else_=products.c.forecasted_at,
+            ),
+        )
+    )
+    for start in range(0, len(product_ids), UPDATE_CHUNK):
+        end = start + UPDATE_CHUNK
+        await db.execute(stmt, [
+            {
+                "product_id": int(product_ids[i]),
+                "forecast": {
+                    "points": int(results["points"][i]),
+                    **{k: _clean(v[i]) for k, v in columns.items()},
+                },
+                "observations": int(observations[i]),
+                "stamp": now,
+            }
+            for i in range(start, min(end, len(product_ids)))
+        ])
+    await db.commit()
+    if len(product_ids):
+        await response_cache.invalidate(cache.PRODUCTS)
+
+    return {
+        "products": int(len(product_ids)),
+        "load_seconds": round(loaded - started, 3),
+        "fit_seconds": round(fitted - loaded, 3),
+        "write_seconds": round(time.perf_counter() - fitted, 3),
+    }
+
+async def run_forecast_loop():
+    """Periodic incremental forecasting; started from the app lifespan"""
+    while True:
+        await asyncio.sleep(settings.FORECAST_INTERVAL_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await run(db)
+        except Exception as e:
+            if asyncio.current_task().cancelling():
+                break
+            print(f"Price forecasting failed: {e}")
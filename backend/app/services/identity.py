@@ -0,0 +1,225 @@
+"""
+Identity lookups for /api/auth (check and register).
+
+Users are cached by email in the response cache's backends: Redis when
+reachable (IDENTITY_CACHE_BACKEND "auto" or "redis"), else a per-worker
+LRU with TTL. Unknown emails are cached too, for the shorter
+IDENTITY_NEGATIVE_TTL_SECONDS. Registration writes the new user through
+and toggling a user's status drops its entry.
+
+A Bloom filter of registered emails answers most unknown emails before
+the cache or the database is touched: a clear bit means the email was
+never registered. With Redis its bits live in one shared bitmap, so a
+signup on any worker is visible to all of them at once. In-process,
+each worker picks up other workers' signups by polling for new user ids
+every IDENTITY_BLOOM_REFRESH_SECONDS. Until the filter has been loaded
+from the users table every lookup falls through to the cache.
+"""
+import asyncio
+import hashlib
+import json
+import math
+from typing import Iterable, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import MemoryBackend, connect_redis
+from app.core.config import settings
+from app.core.database import read_router
+from app.models.user import User
+
+USER_PREFIX = "identity:user:"
+BLOOM_KEY = "identity:bloom"
+# Set once the bitmap holds every user; a SETBIT alone would recreate a bitmap missing the rest
+BLOOM_LOADED_KEY = "identity:bloom:loaded"
+# Ids can commit out of order; each refresh re-reads this many below the last seen
+REFRESH_LOOKBACK_IDS = 1000
+FIELDS = ("id", "email", "full_name", "phone_number", "is_active", "is_protocol_activated")
+
+class BloomFilter:
+    """
+    Bits are numbered most-significant first within each byte, as Redis
+    SETBIT/GETBIT number them, so a filter built here can be OR-ed into
+    the shared bitmap.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, email: str) -> List[int]:
+        digest = hashlib.blake2b(email.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, email: str):
+        for position in self.positions(email):
+            self.bits[position >> 3] |= 0x80 >> (position & 7)
+
+    def __contains__(self, email: str) -> bool:
+        return all(self.bits[p >> 3] & (0x80 >> (p & 7)) for p in self.positions(email))
+
+def record(user: User) -> dict:
+    return {field: getattr(user, field) for field in FIELDS}
+
+class IdentityCache:
+    def __init__(self):
+        self.backend = MemoryBackend(settings.IDENTITY_CACHE_MAX_ENTRIES)
+        self.bloom = BloomFilter(settings.IDENTITY_BLOOM_CAPACITY, settings.IDENTITY_BLOOM_ERROR_RATE)
+        self.bloom_ready = False
+        self.last_user_id = 0
+        self.bloom_emails = 0
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {
+            "hits": 0, "negative_hits": 0, "bloom_rejections": 0, "misses": 0,
+            "invalidations": 0, "errors": 0,
+        }
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.name == "redis"
+
+    async def start(self):
+        """Pick the backend and load the Bloom filter; called from the app lifespan"""
+        mode = settings.IDENTITY_CACHE_BACKEND
+        if mode in ("auto", "redis"):
+            backend = await connect_redis(settings.REDIS_URL)
+            if backend is not None:
+                self.backend = backend
+            elif mode == "redis":
+                print("Redis unavailable, identity cache falling back to in-process LRU")
+        if settings.IDENTITY_BLOOM_ENABLED:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        await self.backend.close()
+
+    async def run(self):
+        """Initial load, then (in-process only) pick up signups from other workers"""
+        while not self.bloom_ready:
+            try:
+                await self.load_bloom()
+            except Exception as e:
+                print(f"Identity Bloom filter load failed: {e}")
+                await asyncio.sleep(settings.IDENTITY_BLOOM_REFRESH_SECONDS)
+        while not self.shared:
+            await asyncio.sleep(settings.IDENTITY_BLOOM_REFRESH_SECONDS)
+            try:
+                await self.load_bloom()
+            except Exception as e:
+                print(f"Identity Bloom filter refresh failed: {e}")
+
+    async def load_bloom(self):
+        """Add emails of users created since the last load"""
+        since = self.last_user_id - REFRESH_LOOKBACK_IDS if self.bloom_ready else 0
+        async with read_router.session() as db:
+            result = await db.stream(
+                select(User.id, User.email)
+                .where(User.id > since)
+                .order_by(User.id)
+                .execution_options(yield_per=10000)
+            )
+            async for user_id, email in result:
+                self.bloom.add(email)
+                if user_id > self.last_user_id:
+                    self.last_user_id = user_id
+                    self.bloom_emails += 1
+        if self.shared and not self.bloom_ready:
+            # OR rather than SET: never drop bits another worker added meanwhile
+            staging = f"{BLOOM_KEY}:load:{id(self)}"
+            client = self.backend.client
+            await client.set(staging, bytes(self.bloom.bits), px=60000)
+            await client.bitop("OR", BLOOM_KEY, BLOOM_KEY, staging)
+            await client.delete(staging)
+            await client.set(BLOOM_LOADED_KEY, 1)
+        self.bloom_ready = True
+
+    async def maybe_registered(self, email: str) -> bool:
+        """False only if the email was definitely never registered"""
+        if not self.bloom_ready:
+            return True
+        if not self.shared:
+            return email in self.bloom
+        pipe = self.backend.client.pipeline(transaction=False)
+        pipe.exists(BLOOM_LOADED_KEY)
+        for position in self.bloom.positions(email):
+            pipe.getbit(BLOOM_KEY, position)
+        exists, *bits = await pipe.execute()
+        if not exists:
+            # Redis restarted or evicted the bitmap: trust nothing until it is reloaded
+            self.bloom_ready = False
+            self.last_user_id = self.bloom_emails = 0
+            if self.task is None or self.task.done():
+                self.task = asyncio.create_task(self.run())
+            return True
+        return all(bits)
+
+    async def add_to_bloom(self, email: str):
+        self.bloom.add(email)
+        if self.shared:
+            pipe = self.backend.client.pipeline(transaction=False)
+            for position in self.bloom.positions(email):
+                pipe.setbit(BLOOM_KEY, position, 1)
+            await pipe.execute()
+
+    async def lookup(self, db: AsyncSession, email: str) -> Optional[dict]:
+        """The user's record, or None if the email isn't registered"""
+        try:
+            if not await self.maybe_registered(email):
+                self.stats["bloom_rejections"] += 1
+                return None
+            (raw,) = await self.backend.get_many([USER_PREFIX + email])
+        except Exception:
+            self.stats["errors"] += 1
+            raw = None
+        if raw is not None:
+            cached = json.loads(raw)
+            self.stats["hits" if cached is not None else "negative_hits"] += 1
+            return cached
+        self.stats["misses"] += 1
+
+        result = await db.execute(select(User).filter(User.email == email))
+        user = result.scalars().first()
+        found = record(user) if user else None
+        ttl = settings.IDENTITY_CACHE_TTL_SECONDS if found else settings.IDENTITY_NEGATIVE_TTL_SECONDS
+        try:
+            await self.backend.set(USER_PREFIX + email, json.dumps(found), ttl)
+        except Exception:
+            self.stats["errors"] += 1
+        return found
+
+    async def remember(self, user: User):
+        """Write a new or changed user through, replacing any negative entry"""
+        try:
+            await self.add_to_bloom(user.email)
+            await self.backend.set(
+                USER_PREFIX + user.email, json.dumps(record(user)), settings.IDENTITY_CACHE_TTL_SECONDS
+            )
+        except Exception:
+            self.stats["errors"] += 1
+
+    async def forget(self, emails: Iterable[str]):
+        for email in emails:
+            try:
+                await self.backend.delete(USER_PREFIX + email)
+                self.stats["invalidations"] += 1
+            except Exception:
+                self.stats["errors"] += 1
+
+    def metrics(self) -> dict:
+        answered = self.stats["hits"] + self.stats["negative_hits"] + self.stats["bloom_rejections"]
+        lookups = answered + self.stats["misses"]
+        return {
+            "backend": self.backend.name,
+            **self.stats,
+            "hit_rate": round(answered / lookups, 4) if lookups else 0.0,
+            "bloom_ready": self.bloom_ready,
+            "bloom_emails": self.bloom_emails,
+            "bloom_bits": self.bloom.size,
+            "bloom_hashes": self.bloom.hashes,
+        }
+
+identity_cache = IdentityCache()
@@ -0,0 +1,101 @@
+"""
+Monthly range partitions for preorders on PostgreSQL.
+
+The parent table is declared PARTITION BY RANGE (created_at) in the
+model. This module keeps partitions in place: the current month and
+PREORDER_PARTITION_MONTHS_AHEAD months after it, plus a DEFAULT partition
+for rows outside every range (e.g. backfills). Partitions are named
+preorders_pYYYY_MM. Once archival has emptied a month that lies wholly
+before the archive cutoff, its partition is dropped. Other databases keep
+a plain table and every function here is a no-op.
+
+The functions take a sync Connection so init_db.py can call them
+directly; the app runs them through AsyncConnection.run_sync.
+"""
+import re
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.core.config import settings
+
+PARENT = "preorders"
+DEFAULT = f"{PARENT}_default"
+NAME = re.compile(rf"^{PARENT}_p(\d{{4}})_(\d{{2}})$")
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_p{month.year:04d}_{month.month:02d}"
+
+def partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:parent)"
+    ), {"parent": PARENT}).scalar())
+
+def existing(conn: Connection) -> List[str]:
+    return list(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:parent)"
+    ), {"parent": PARENT}).scalars())
+
+def ensure(conn: Connection, today: Optional[date] = None) -> List[str]:
+    """Create missing partitions from this month through the look-ahead; returns the ones created"""
+    if not partitioned(conn):
+        return []
+    have = set(existing(conn))
+    created = []
+    if DEFAULT not in have:
+        conn.execute(text(f"CREATE TABLE {DEFAULT} PARTITION OF {PARENT} DEFAULT"))
+        created.append(DEFAULT)
+    first = month_start(today or date.today())
+    for offset in range(settings.PREORDER_PARTITION_MONTHS_AHEAD + 1):
+        month = add_months(first, offset)
+        name = partition_name(month)
+        if name in have:
+            continue
+        try:
+            # A savepoint per partition: rows for this month already in DEFAULT make PostgreSQL refuse it
+            with conn.begin_nested():
+                conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {PARENT} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+            created.append(name)
+        except Exception as e:
+            print(f"Preorder partition {name} not created: {e}")
+    return created
+
+def drop_empty_before(conn: Connection, cutoff: datetime) -> List[str]:
+    """Drop month partitions that end on or before cutoff and hold no rows"""
+    if not partitioned(conn):
+        return []
+    dropped = []
+    for name in sorted(existing(conn)):
+        match = NAME.match(name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if add_months(month, 1) > cutoff.date():
+            continue
+        if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})")).scalar():
+            continue
+        conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+def describe(conn: Connection) -> List[Tuple[str, int]]:
+    """(partition, estimated rows) for the admin endpoint"""
+    if not partitioned(conn):
+        return []
+    return [tuple(row) for row in conn.execute(text(
+        "SELECT c.relname, c.reltuples::bigint FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:parent) ORDER BY c.relname"
+    ), {"parent": PARENT})]
@@ -0,0 +1,257 @@
+"""
+Price-history time series.
+
+Raw observations are appended in bulk and folded into hourly and daily
+OHLC buckets in the same transaction. Each bucket keeps the times of its
+open and close observations, so out-of-order appends still merge
+correctly. A retention job drops raw points after PRICE_RAW_RETENTION_DAYS
+and hourly buckets after PRICE_HOURLY_RETENTION_DAYS. Daily buckets are
+kept for good. Product.price_trend holds a small summary derived from
+the buckets and is refreshed on every append.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, upsert_insert
+from app.models.price_history import PriceBucket, PriceObservation
+from app.models.product import Product
+
+RESOLUTIONS = ("hour", "day")
+
+def utc(value: Optional[datetime]) -> datetime:
+    if value is None:
+        return datetime.now(timezone.utc)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def bucket_start(ts: datetime, resolution: str) -> datetime:
+    if resolution == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _greatest(db: AsyncSession, a, b):
+    return func.greatest(a, b) if db.bind.dialect.name == "postgresql" else func.max(a, b)
+
+def _least(db: AsyncSession, a, b):
+    return func.least(a, b) if db.bind.dialect.name == "postgresql" else func.min(a, b)
+
+async def append(db: AsyncSession, observations: Iterable[dict]) -> int:
+    """Insert raw observations and merge them into the OHLC buckets; caller commits"""
+    rows = sorted(
+        (
+            {
+                "product_id": o["product_id"],
+                "source": o.get("source") or "manual",
+                "observed_at": utc(o.get("observed_at")),
+                "price": float(o["price"]),
+            }
+            for o in observations
+        ),
+        key=lambda r: r["observed_at"],
+    )
+    if not rows:
+        return 0
+    await db.execute(insert(PriceObservation), rows)
+
+    for resolution in RESOLUTIONS:
+        buckets: Dict[tuple, dict] = {}
+        for row in rows:
+            key = (row["product_id"], bucket_start(row["observed_at"], resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {
+                    "product_id": key[0],
+                    "resolution": resolution,
+                    "bucket_start": key[1],
+                    "open": row["price"],
+                    "high": row["price"],
+                    "low": row["price"],
+                    "close": row["price"],
+                    "count": 1,
+                    "first_at": row["observed_at"],
+                    "last_at": row["observed_at"],
+                }
+                continue
+            bucket["high"] = max(bucket["high"], row["price"])
+            bucket["low"] = min(bucket["low"], row["price"])
+            bucket["close"] = row["price"]
+            bucket["last_at"] = row["observed_at"]
+            bucket["count"] += 1
+
+        stmt = upsert_insert(db, PriceBucket).values(list(buckets.values()))
+        new = stmt.excluded
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["product_id", "resolution", "bucket_start"],
+            set_={
+                "open": case((new.first_at < PriceBucket.first_at, new.open), else_=PriceBucket.open),
+                "close": case((new.last_at >= PriceBucket.last_at, new.close), else_=PriceBucket.close),
+                "high": _greatest(db, PriceBucket.high, new.high),
+                "low": _least(db, PriceBucket.low, new.low),
+                "first_at": _least(db, PriceBucket.first_at, new.first_at),
+                "last_at": _greatest(db, PriceBucket.last_at, new.last_at),
+                "count": PriceBucket.count + new.count,
+            },
+        ))
+
+    ids = sorted({r["product_id"] for r in rows})
+    # Any new observation, however old, makes the stored forecast stale
+    await db.execute(
+        update(Product)
+        .where(Product.id.in_(ids))
+        .values(forecasted_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await refresh_trends(db, ids)
+    return len(rows)
+
+def _change(current: float, reference: Optional[float]) -> Optional[float]:
+    if not reference:
+        return None
+    return round((current - reference) / reference * 100, 2)
+
+async def refresh_trends(db: AsyncSession, product_ids: Iterable[int]):
+    """Recompute the cached price_trend summary from the last 30 daily buckets"""
+    ids = sorted(set(product_ids))
+    if not ids:
+        return
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        select(PriceBucket.product_id, PriceBucket.bucket_start, PriceBucket.open,
+               PriceBucket.high, PriceBucket.low, PriceBucket.close)
+        .where(
+            PriceBucket.product_id.in_(ids),
+            PriceBucket.resolution == "day",
+            PriceBucket.bucket_start >= bucket_start(now - timedelta(days=30), "day"),
+        )
+        .order_by(PriceBucket.product_id, PriceBucket.bucket_start)
+    )
+    days: Dict[int, list] = {}
+    for row in result.all():
+        days.setdefault(row.product_id, []).append(row)
+
+    result = await db.execute(
+        select(PriceBucket.product_id, PriceBucket.open)
+        .where(
+            PriceBucket.product_id.in_(ids),
+            PriceBucket.resolution == "hour",
+            PriceBucket.bucket_start >= bucket_start(now - timedelta(hours=24), "hour"),
+        )
+        .order_by(PriceBucket.product_id, PriceBucket.bucket_start)
+    )
+    day_open: Dict[int, float] = {}
+    for product_id, open_price in result.all():
+        day_open.setdefault(product_id, open_price)
+
+    week_start = utc(bucket_start(now - timedelta(days=7), "day"))
+    summaries = []
+    for product_id, buckets in days.items():
+        last = buckets[-1].close
+        week = [b for b in buckets if utc(b.bucket_start) >= week_start]
+        summaries.append({
+            "id": product_id,
+            "price_trend": {
+                "last": last,
+                "change_24h_pct": _change(last, day_open.get(product_id)),
+                "change_7d_pct": _change(last, week[0].open if week else None),
+                "change_30d_pct": _change(last, buckets[0].open),
+                "low_30d": min(b.low for b in buckets),
+                "high_30d": max(b.high for b in buckets),
+                "updated_at": now.isoformat(),
+            },
+        })
+    if summaries:
+        await db.execute(update(Product), summaries)
+
+def pick_resolution(start: datetime, end: datetime) -> str:
+    now = datetime.now(timezone.utc)
+    span = end - start
+    if span <= timedelta(days=2) and start >= now - timedelta(days=settings.PRICE_RAW_RETENTION_DAYS):
+        return "raw"
+    if span <= timedelta(days=60) and start >= now - timedelta(days=settings.PRICE_HOURLY_RETENTION_DAYS):
+        return "hour"
+    return "day"
+
+async def history(
+    db: AsyncSession,
+    product_id: int,
+    start: datetime,
+    end: datetime,
+    resolution: str = "auto",
+    limit: int = 5000,
+) -> dict:
+    start, end = utc(start), utc(end)
+    if resolution == "auto":
+        resolution = pick_resolution(start, end)
+
+    if resolution == "raw":
+        result = await db.execute(
+            select(PriceObservation.observed_at, PriceObservation.price, PriceObservation.source)
+            .where(
+                PriceObservation.product_id == product_id,
+                PriceObservation.observed_at >= start,
+                PriceObservation.observed_at < end,
+            )
+            .order_by(PriceObservation.observed_at)
+            .limit(limit)
+        )
+        points = [{"t": utc(t).isoformat(), "price": price, "source": source} for t, price, source in result.all()]
+    else:
+        result = await db.execute(
+            select(PriceBucket.bucket_start, PriceBucket.open, PriceBucket.high,
+                   PriceBucket.low, PriceBucket.close, PriceBucket.count)
+            .where(
+                PriceBucket.product_id == product_id,
+                PriceBucket.resolution == resolution,
+                PriceBucket.bucket_start >= bucket_start(start, resolution),
+                PriceBucket.bucket_start < end,
+            )
+            .order_by(PriceBucket.bucket_start)
+            .limit(limit)
+        )
+        points = [
+            {"t": utc(t).isoformat(), "open": o, "high": h, "low": l, "close": c, "count": n}
+            for t, o, h, l, c, n in result.all()
+        ]
+
+    return {
+        "product_id": product_id,
+        "resolution": resolution,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "points": points,
+    }
+
+async def apply_retention(db: AsyncSession) -> dict:
+    """Drop raw points and hourly buckets that have aged into coarser resolutions"""
+    now = datetime.now(timezone.utc)
+    raw = await db.execute(
+        delete(PriceObservation)
+        .where(PriceObservation.observed_at < now - timedelta(days=settings.PRICE_RAW_RETENTION_DAYS))
+        .execution_options(synchronize_session=False)
+    )
+    hourly = await db.execute(
+        delete(PriceBucket)
+        .where(
+            PriceBucket.resolution == "hour",
+            PriceBucket.bucket_start < now - timedelta(days=settings.PRICE_HOURLY_RETENTION_DAYS),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return {"raw_deleted": raw.rowcount, "hourly_deleted": hourly.rowcount}
+
+async def run_retention_loop():
+    """Periodically apply retention; started from the app lifespan"""
+    while True:
+        await asyncio.sleep(settings.PRICE_RETENTION_INTERVAL_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await apply_retention(db)
+        except Exception as e:
+            if asyncio.current_task().cancelling():
+                break
+            print(f"Price history retention failed: {e}")
@@ -0,0 +1,220 @@
+"""
+Live cluster progress for /api/stream/clusters (Server-Sent Events).
+
+counters.add_to_products stages each product's post-update
+current_preorders on the session. The hub picks them up only when that
+transaction commits, so rolled-back preorders are never announced.
+Changes are coalesced per product and flushed every
+STREAM_BATCH_INTERVAL_MS as a single event. With striped counters,
+progress follows compaction, as rollups do.
+
+With Redis (STREAM_BACKEND "auto" or "redis") every worker publishes its
+batches to one channel and fans out whatever arrives on it, so a client
+sees commits from all workers. Otherwise batches stay in-process.
+
+A subscriber is a small ring of pre-encoded frames plus an Event, so an
+idle connection costs one suspended generator. Unfiltered subscribers
+share one encoded frame per batch, as do subscribers watching the same
+ids. Fan-out yields to the event loop every FANOUT_SLICE subscribers.
+A keep-alive comment goes out to everyone every STREAM_HEARTBEAT_SECONDS.
+A subscriber that falls a full ring behind is disconnected; EventSource
+reconnects by itself.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.cache import connect_redis
+from app.core.config import settings
+
+CHANNEL = "stream:clusters"
+STAGED = "cluster_progress"
+HEARTBEAT = b": keep-alive\n\n"
+FANOUT_SLICE = 1000
+
+def stage(db: AsyncSession, rows: Iterable):
+    """Remember post-update counts from UPDATE ... RETURNING until the transaction commits"""
+    staged = db.sync_session.info.setdefault(STAGED, {})
+    for row in rows:
+        staged[row.id] = (row.current_preorders or 0, row.target_quantity)
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    staged = session.info.pop(STAGED, None)
+    if staged:
+        hub.record(staged)
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(STAGED, None)
+
+def frame(clusters: List[dict]) -> bytes:
+    data = json.dumps({"clusters": clusters}, separators=(",", ":"))
+    return f"event: progress\ndata: {data}\n\n".encode()
+
+class Subscriber:
+    __slots__ = ("ids", "frames", "ready", "closed", "lagged")
+
+    def __init__(self, ids: Optional[FrozenSet[int]], capacity: int):
+        self.ids = ids
+        self.frames = deque(maxlen=capacity)
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.lagged = False
+
+    def push(self, data: bytes):
+        if len(self.frames) == self.frames.maxlen:
+            self.closed = self.lagged = True  # Too slow to keep up; let the client reconnect
+        else:
+            self.frames.append(data)
+        self.ready.set()
+
+class ProgressHub:
+    def __init__(self):
+        self.pending: Dict[int, Tuple[int, Optional[int]]] = {}
+        self.subscribers: Set[Subscriber] = set()
+        self.redis = None
+        self.task: Optional[asyncio.Task] = None
+        self.listener: Optional[asyncio.Task] = None
+        self.stats = {"batches": 0, "clusters": 0, "frames": 0, "dropped_subscribers": 0, "publish_errors": 0}
+
+    def record(self, counts: Dict[int, Tuple[int, Optional[int]]]):
+        self.pending.update(counts)
+
+    async def start(self):
+        mode = settings.STREAM_BACKEND
+        if mode in ("auto", "redis"):
+            backend = await connect_redis(settings.REDIS_URL)
+            if backend is not None:
+                self.redis = backend.client
+                self.listener = asyncio.create_task(self.listen())
+            elif mode == "redis":
+                print("Redis unavailable, cluster stream falling back to in-process fan-out")
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        for task in (self.task, self.listener):
+            if task:
+                task.cancel()
+        for subscriber in self.subscribers:
+            subscriber.closed = True
+            subscriber.ready.set()
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+
+    async def run(self):
+        interval = settings.STREAM_BATCH_INTERVAL_MS / 1000
+        last_heartbeat = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.pending:
+                    await self.flush()
+                if time.monotonic() - last_heartbeat >= settings.STREAM_HEARTBEAT_SECONDS:
+                    last_heartbeat = time.monotonic()
+                    await self.broadcast(HEARTBEAT)
+            except Exception as e:
+                print(f"Cluster stream flush failed: {e}")
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        clusters = [
+            {
+                "id": product_id,
+                "current_preorders": current,
+                "target_quantity": target,
+                "progress": round(current / target, 4) if target else None,
+            }
+            for product_id, (current, target) in sorted(pending.items())
+        ]
+        self.stats["batches"] += 1
+        self.stats["clusters"] += len(clusters)
+        if self.redis is not None:
+            try:
+                await self.redis.publish(CHANNEL, json.dumps(clusters, separators=(",", ":")))
+                return
+            except Exception:
+                self.stats["publish_errors"] += 1
+        await self.deliver(clusters)
+
+    async def listen(self):
+        """Fan out batches from every worker, resubscribing if Redis drops"""
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self.deliver(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cluster stream subscription failed: {e}")
+                await asyncio.sleep(1)
+
+    async def deliver(self, clusters: List[dict]):
+        """Push one batch to every subscriber, yielding to the loop between slices"""
+        by_id = {c["id"]: c for c in clusters}
+        encoded: Dict[Optional[FrozenSet[int]], Optional[bytes]] = {}
+        for start, subscriber in enumerate(list(self.subscribers)):
+            if start and start % FANOUT_SLICE == 0:
+                await asyncio.sleep(0)
+            ids = subscriber.ids
+            if ids not in encoded:
+                if ids is None:
+                    encoded[ids] = frame(clusters)
+                else:
+                    # Viewers of one product page share an id set, and so a frame
+                    wanted = [by_id[i] for i in ids if i in by_id] if len(ids) < len(by_id) else [
+                        c for c in clusters if c["id"] in ids
+                    ]
+                    encoded[ids] = frame(sorted(wanted, key=lambda c: c["id"])) if wanted else None
+            data = encoded[ids]
+            if data is not None:
+                subscriber.push(data)
+        self.stats["frames"] += 1
+
+    async def broadcast(self, data: bytes):
+        for start, subscriber in enumerate(list(self.subscribers)):
+            if start and start % FANOUT_SLICE == 0:
+                await asyncio.sleep(0)
+            subscriber.push(data)
+
+    def subscribe(self, ids: Optional[Iterable[int]] = None) -> Optional[Subscriber]:
+        if len(self.subscribers) >= settings.STREAM_MAX_SUBSCRIBERS:
+            return None
+        subscriber = Subscriber(frozenset(ids) if ids is not None else None, settings.STREAM_QUEUE_FRAMES)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+        if subscriber.lagged:
+            self.stats["dropped_subscribers"] += 1
+
+    async def events(self, subscriber: Subscriber):
+        """SSE body for one subscriber; ends when the client goes away or falls behind"""
+        try:
+            yield f"retry: {settings.STREAM_RETRY_MS}\n\n".encode()
+            while not subscriber.closed:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                while subscriber.frames and not subscriber.closed:
+                    yield subscriber.frames.popleft()
+        finally:
+            self.unsubscribe(subscriber)
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "backend": "redis" if self.redis is not None else "memory",
+            "subscribers": len(self.subscribers),
+            "pending_clusters": len(self.pending),
+        }
+
+hub = ProgressHub()
@@ -0,0 +1,285 @@
+"""
+Per-category analytics rollups, and per-user preorder totals.
+
+The dashboard and price-impact endpoints read O(categories) rows from
+category_rollups instead of scanning products and preorders. Rows are
+updated in the same transaction as the write that changes them:
+product creation, activation, settlement, and every change to
+current_preorders (see counters.add_to_products). With striped counters
+that last path runs in the compactor, so rollups follow compaction.
+Cancelled preorders no longer count towards preorder_units.
+Preorders moved to cold storage by services/archive.py keep counting via
+the archived totals tables in rebuilds.
+
+user_rollups holds order count and spend (whole cents) per email for the
+admin registry and user exports. It is bumped in the same transaction as
+every preorder insert (record_preorders); user_totals() is the full
+recomputation rebuild() and check() compare it with.
+"""
+import math
+from typing import Dict, Iterable, List
+from sqlalchemy import BigInteger, and_, case, cast, delete, func, insert, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import upsert_insert
+from app.models.analytics import CategoryRollup, UserRollup
+from app.models.archive import PreorderArchiveProductTotal, PreorderArchiveUserTotal
+from app.models.product import Product, Preorder, ProductCounterShard
+
+USER_UPSERT_CHUNK = 1000
+
+MEASURES = (
+    "active_products", "active_campaigns", "active_preorders",
+    "tariff_sum", "tariff_count", "savings_pct_sum", "savings_pct_count",
+    "preorder_units", "savings_total",
+)
+
+def category_key(category) -> str:
+    return category or ""
+
+def _add(changes: Dict[str, Dict[str, float]], category, **deltas):
+    row = changes.setdefault(category_key(category), {})
+    for measure, delta in deltas.items():
+        row[measure] = row.get(measure, 0) + delta
+
+def _active_contribution(changes, product: Product, sign: int):
+    current = product.current_preorders or 0
+    _add(
+        changes, product.category,
+        active_products=sign,
+        active_campaigns=sign if current > 0 else 0,
+        active_preorders=sign * current,
+        tariff_sum=sign * (product.tariff_impact or 0),
+        tariff_count=sign if product.tariff_impact is not None else 0,
+        savings_pct_sum=sign * (product.savings_percentage or 0),
+        savings_pct_count=sign if product.savings_percentage is not None else 0,
+    )
+
+async def apply(db: AsyncSession, changes: Dict[str, Dict[str, float]]):
+    """Upsert measure deltas for every touched category in one statement"""
+    rows = [
+        {"category": category, **{m: deltas.get(m, 0) for m in MEASURES}}
+        for category, deltas in sorted(changes.items())
+        if any(deltas.values())
+    ]
+    if not rows:
+        return
+    stmt = upsert_insert(db, CategoryRollup).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["category"],
+        set_={
+            **{m: getattr(CategoryRollup, m) + getattr(stmt.excluded, m) for m in MEASURES},
+            "updated_at": func.now(),
+        },
+    ))
+
+async def record_products_created(db: AsyncSession, products: Iterable[Product]):
+    """Call after flush so column defaults are populated"""
+    changes = {}
+    for product in products:
+        _add(
+            changes, product.category,
+            savings_total=(product.retail_price - product.group_buy_price) * (product.current_preorders or 0),
+        )
+        if product.is_active:
+            _active_contribution(changes, product, 1)
+    await apply(db, changes)
+
+async def record_activation(db: AsyncSession, product: Product, active: bool):
+    """Call before flipping product.is_active"""
+    if bool(product.is_active) == active:
+        return
+    changes = {}
+    _active_contribution(changes, product, 1 if active else -1)
+    await apply(db, changes)
+
+async def record_deactivations(db: AsyncSession, rows: Iterable):
+    """
+    Remove active contributions of products just deactivated by a set-based
+    UPDATE. rows come from its RETURNING and must all have been active before.
+    """
+    changes = {}
+    for row in rows:
+        _active_contribution(changes, row, -1)
+    await apply(db, changes)
+
+async def record_counter_changes(db: AsyncSession, rows: Iterable, deltas: Dict[int, int]):
+    """
+    Fold current_preorders deltas into rollups.
+    rows come from UPDATE ... RETURNING, so current_preorders is post-update.
+    """
+    changes = {}
+    for row in rows:
+        delta = deltas[row.id]
+        after = row.current_preorders or 0
+        before = after - delta
+        _add(
+            changes, row.category,
+            preorder_units=delta,
+            savings_total=(row.retail_price - row.group_buy_price) * delta,
+        )
+        if row.is_active:
+            _add(
+                changes, row.category,
+                active_preorders=delta,
+                active_campaigns=(after > 0) - (before > 0),
+            )
+    await apply(db, changes)
+
+def cents(price, quantity) -> int:
+    """Spend of one preorder in whole cents, rounded half up like SQL round()"""
+    return math.floor((price or 0) * (quantity or 0) * 100 + 0.5)
+
+async def record_preorders(db: AsyncSession, rows: Iterable[dict]):
+    """Add new preorders (user_email, quantity, price_locked) to user_rollups"""
+    users: Dict[str, list] = {}
+    for row in rows:
+        if row["user_email"] is None:
+            continue
+        user = users.setdefault(row["user_email"], [0, 0])
+        user[0] += 1
+        user[1] += cents(row["price_locked"], row["quantity"])
+    # Sorted, so concurrent batches lock the rows in the same order
+    values = [
+        {"user_email": email, "order_count": count, "spent_cents": spent}
+        for email, (count, spent) in sorted(users.items())
+    ]
+    for start in range(0, len(values), USER_UPSERT_CHUNK):
+        stmt = upsert_insert(db, UserRollup).values(values[start:start + USER_UPSERT_CHUNK])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_email"],
+            set_={
+                "order_count": UserRollup.order_count + stmt.excluded.order_count,
+                "spent_cents": UserRollup.spent_cents + stmt.excluded.spent_cents,
+            },
+        ))
+
+async def load(db: AsyncSession) -> List[CategoryRollup]:
+    result = await db.execute(select(CategoryRollup))
+    return list(result.scalars().all())
+
+async def compute(db: AsyncSession) -> Dict[str, Dict[str, float]]:
+    """Recompute every rollup from scratch with full scans"""
+    active = Product.is_active == True
+    result = await db.execute(select(
+        func.coalesce(Product.category, ""),
+        func.sum(case((active, 1), else_=0)),
+        func.sum(case((and_(active, Product.current_preorders > 0), 1), else_=0)),
+        func.sum(case((active, Product.current_preorders), else_=0)),
+        func.sum(case((active, Product.tariff_impact), else_=0)),
+        func.count(case((and_(active, Product.tariff_impact.isnot(None)), 1))),
+        func.sum(case((active, Product.savings_percentage), else_=0)),
+        func.count(case((and_(active, Product.savings_percentage.isnot(None)), 1))),
+        func.sum((Product.retail_price - Product.group_buy_price) * Product.current_preorders),
+    ).group_by(func.coalesce(Product.category, "")))
+    totals: Dict[str, Dict[str, float]] = {}
+    for category, *values in result.all():
+        totals[category] = dict(zip(
+            ("active_products", "active_campaigns", "active_preorders", "tariff_sum",
+             "tariff_count", "savings_pct_sum", "savings_pct_count", "savings_total"),
+            (v or 0 for v in values),
+        ))
+
+    # Preorders without a matching product count towards the "" category
+    result = await db.execute(select(
+        func.coalesce(Product.category, ""),
+        func.sum(Preorder.quantity),
+    ).outerjoin(Product, Product.id == Preorder.product_id)
+     .where(Preorder.status != "cancelled")
+     .group_by(func.coalesce(Product.category, "")))
+    for category, units in result.all():
+        totals.setdefault(category, {})["preorder_units"] = units or 0
+
+    # Archived preorders left the table but still count
+    result = await db.execute(select(
+        func.coalesce(Product.category, ""),
+        func.sum(PreorderArchiveProductTotal.units),
+    ).outerjoin(Product, Product.id == PreorderArchiveProductTotal.product_id)
+     .group_by(func.coalesce(Product.category, "")))
+    for category, units in result.all():
+        measures = totals.setdefault(category, {})
+        measures["preorder_units"] = measures.get("preorder_units", 0) + (units or 0)
+
+    # Uncompacted counter shards haven't reached the rollups yet
+    result = await db.execute(select(
+        func.coalesce(Product.category, ""),
+        func.sum(ProductCounterShard.count),
+    ).outerjoin(Product, Product.id == ProductCounterShard.product_id).group_by(func.coalesce(Product.category, "")))
+    for category, pending in result.all():
+        measures = totals.setdefault(category, {})
+        measures["preorder_units"] = measures.get("preorder_units", 0) - (pending or 0)
+
+    return {
+        category: {m: measures.get(m, 0) for m in MEASURES}
+        for category, measures in totals.items()
+    }
+
+def user_totals():
+    """Order count and spend in cents per email, recomputed from live preorders plus archived totals"""
+    spent = func.coalesce(Preorder.price_locked, 0) * func.coalesce(Preorder.quantity, 0)
+    live = select(
+        Preorder.user_email.label("user_email"),
+        func.count(Preorder.id).label("order_count"),
+        func.sum(func.round(spent * 100)).label("spent_cents"),
+    ).where(Preorder.user_email.isnot(None)).group_by(Preorder.user_email)
+    archived = select(
+        PreorderArchiveUserTotal.user_email,
+        PreorderArchiveUserTotal.order_count,
+        func.round(PreorderArchiveUserTotal.total_spent * 100),
+    )
+    combined = union_all(live, archived).subquery()
+    return select(
+        combined.c.user_email,
+        cast(func.sum(combined.c.order_count), BigInteger).label("order_count"),
+        cast(func.sum(combined.c.spent_cents), BigInteger).label("spent_cents"),
+    ).group_by(combined.c.user_email).subquery()
+
+async def rebuild(db: AsyncSession) -> int:
+    """Replace all rollups with a from-scratch recomputation"""
+    totals = await compute(db)
+    await db.execute(delete(CategoryRollup))
+    if totals:
+        await apply(db, totals)
+    users = user_totals()
+    await db.execute(delete(UserRollup))
+    await db.execute(insert(UserRollup).from_select(
+        ["user_email", "order_count", "spent_cents"],
+        select(users.c.user_email, users.c.order_count, users.c.spent_cents),
+    ))
+    await db.commit()
+    return len(totals)
+
+async def check(db: AsyncSession, tolerance: float = 0.01) -> List[dict]:
+    """Compare stored rollups with a recomputation and list mismatched measures"""
+    expected = await compute(db)
+    stored = {r.category: r for r in await load(db)}
+    mismatches = []
+    for category in sorted(set(expected) | set(stored)):
+        want = expected.get(category, {})
+        row = stored.get(category)
+        for measure in MEASURES:
+            have = getattr(row, measure) if row is not None else 0
+            if abs((have or 0) - want.get(measure, 0)) > tolerance:
+                mismatches.append({
+                    "category": category,
+                    "measure": measure,
+                    "stored": have,
+                    "expected": want.get(measure, 0),
+                })
+
+    users = user_totals()
+    result = await db.execute(select(users.c.user_email, users.c.order_count, users.c.spent_cents))
+    expected_users = {email: (count, spent) for email, count, spent in result.all()}
+    result = await db.execute(select(UserRollup.user_email, UserRollup.order_count, UserRollup.spent_cents))
+    stored_users = {email: (count, spent) for email, count, spent in result.all()}
+    for email in sorted(set(expected_users) | set(stored_users)):
+        want = expected_users.get(email, (0, 0))
+        have = stored_users.get(email, (0, 0))
+        for measure, stored_value, expected_value in zip(("order_count", "spent_cents"), have, want):
+            if stored_value != expected_value:
+                mismatches.append({
+                    "user_email": email,
+                    "measure": measure,
+                    "stored": stored_value,
+                    "expected": expected_value,
+                })
+    return mismatches
@@ -0,0 +1,279 @@
+"""
+Product search.
+
+On PostgreSQL, matching and text ranking run in SQL against the GIN
+index on models.product.search_document. Every query term is a prefix
+(to_tsquery 'term:*'). Other databases use an in-process inverted index
+instead. It is built from a snapshot of active products, with postings
+as NumPy arrays, and prefixes expand through the sorted vocabulary.
+Either way, the best SEARCH_CANDIDATES text matches, already weighted
+by savings_percentage, are re-ranked by preorder momentum from the
+velocity tracker.
+
+Suggestions use the snapshot's vocabulary on every database. Each term
+is stored under its one-character deletions (SymSpell), so a misspelled
+word finds its likely respellings without scanning the vocabulary; they
+are then checked to be within edit distance 2.
+
+The snapshot is rebuilt every SEARCH_INDEX_TTL_SECONDS, or sooner after
+mark_stale(). Requests keep using the previous one while it rebuilds.
+"""
+import asyncio
+import math
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import read_router
+from app.models.product import Product, search_document
+from app.services.trending import velocity
+
+NAME_WEIGHT = 1.0
+DESCRIPTION_WEIGHT = 0.4  # ts_rank's default weight for 'B'
+MAX_EXPANSIONS = 64
+MAX_QUERY_TERMS = 8
+SUGGESTIONS = 3
+
+_token = re.compile(r"[a-z0-9]+")
+
+def normalize(word: str) -> str:
+    """Light plural folding so 'panels' and 'panel' share a term"""
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return [normalize(w) for w in _token.findall((text or "").lower())]
+
+def _deletes(word: str) -> set:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+def edit_distance(a: str, b: str, limit: int = 2) -> int:
+    """Levenshtein distance, giving up once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class SearchIndex:
+    def __init__(self, rows: List[tuple], postings: bool = True):
+        """rows are (id, name, description, category, savings_percentage) of active products"""
+        self.built_at = time.monotonic()
+        self.ids = np.array([r[0] for r in rows], dtype=np.int64)
+        self.categories = np.array([r[3] or "" for r in rows], dtype=object)
+        self.savings = np.array([r[4] or 0.0 for r in rows], dtype=np.float64)
+
+        # One (term, document, weight) entry per token occurrence, aggregated with NumPy
+        provisional: Dict[str, int] = {}
+        folded: Dict[str, str] = {}
+        term_ids, docs, weights = [], [], []
+        for doc, (_, name, description, _, _) in enumerate(rows):
+            for field, weight in ((name, NAME_WEIGHT), (description, DESCRIPTION_WEIGHT)):
+                for word in _token.findall((field or "").lower()):
+                    term = folded.get(word)
+                    if term is None:
+                        term = folded[word] = normalize(word)
+                    term_ids.append(provisional.setdefault(term, len(provisional)))
+                    docs.append(doc)
+                    weights.append(weight)
+
+        self.terms = sorted(provisional)
+        rank = np.empty(len(provisional), dtype=np.int64)
+        rank[[provisional[t] for t in self.terms]] = np.arange(len(self.terms))
+        n = max(len(rows), 1)
+        keys, inverse = np.unique(
+            rank[np.array(term_ids, dtype=np.int64)] * n + np.array(docs, dtype=np.int64), return_inverse=True
+        )
+        tf = np.bincount(inverse, weights=np.array(weights)) if len(keys) else np.zeros(0)
+        terms = keys // n
+        self.df = np.bincount(terms, minlength=len(self.terms))
+        self.offsets = np.concatenate(([0], np.cumsum(self.df)))
+        self.docs = keys % n
+        self.scores = np.zeros(0)
+        if postings:
+            # Saturating tf times idf, as in BM25 without length normalization
+            self.scores = tf / (tf + 1) * np.log(1 + n / self.df[terms])
+
+        self.deletes: Dict[str, List[int]] = {}
+        for i, term in enumerate(self.terms):
+            if not term.isalpha():
+                continue  # Model numbers and sizes aren't worth respelling
+            for variant in _deletes(term) | {term}:
+                self.deletes.setdefault(variant, []).append(i)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def expand(self, prefix: str) -> List[int]:
+        """Vocabulary ids starting with prefix; the most frequent when there are many"""
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + "\uffff", lo)
+        ids = range(lo, hi)
+        if len(ids) > MAX_EXPANSIONS:
+            ids = np.arange(lo, hi)[np.argsort(-self.df[lo:hi], kind="stable")[:MAX_EXPANSIONS]]
+        return list(ids)
+
+    def match(self, terms: List[str], candidates: int, category: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top candidates as (document positions, text score x savings factor), best first"""
+        total = np.zeros(len(self.ids))
+        matched = self.categories == category if category else np.ones(len(self.ids), dtype=bool)
+        for term in terms:
+            expansions = self.expand(term)
+            if not expansions:
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+            best = np.zeros(len(self.ids))
+            for i in expansions:
+                lo, hi = self.offsets[i], self.offsets[i + 1]
+                docs = self.docs[lo:hi]
+                best[docs] = np.maximum(best[docs], self.scores[lo:hi])
+            total += best
+            matched &= best > 0
+        docs = np.flatnonzero(matched)
+        scores = total[docs] * (1 + settings.SEARCH_SAVINGS_WEIGHT * self.savings[docs] / 100)
+        if len(docs) > candidates:
+            top = np.argpartition(-scores, candidates)[:candidates]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return docs[order], scores[order]
+
+    def corrections(self, word: str) -> List[str]:
+        """Vocabulary terms within edit distance 2, closest and most frequent first"""
+        found = set()
+        for variant in _deletes(word) | {word}:
+            found.update(self.deletes.get(variant, ()))
+        scored = []
+        for i in found:
+            distance = edit_distance(word, self.terms[i])
+            if distance <= 2:
+                scored.append((distance, -self.df[i], self.terms[i]))
+        return [term for _, _, term in sorted(scored)]
+
+    def suggest(self, terms: List[str]) -> List[str]:
+        """Respelled queries for terms that match nothing in the catalog"""
+        options = []
+        for term in terms:
+            if self.expand(term):
+                options.append([term])
+                continue
+            fixes = [c for c in self.corrections(term) if c != term]
+            if not fixes:
+                return []
+            options.append(fixes[:SUGGESTIONS])
+        if all(len(o) == 1 and o[0] == t for o, t in zip(options, terms)):
+            return []
+        return [
+            " ".join(o[min(k, len(o) - 1)] for o in options)
+            for k in range(max(len(o) for o in options))
+        ]
+
+class IndexHolder:
+    """Rebuilds the index when older than the TTL, serving the previous one meanwhile"""
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.index: Optional[SearchIndex] = None
+        self.stale = False
+        self.lock = asyncio.Lock()
+        self.refreshing: Optional[asyncio.Task] = None
+
+    def mark_stale(self):
+        self.stale = True
+
+    async def build(self, db: AsyncSession, postings: bool) -> SearchIndex:
+        result = await db.execute(
+            select(Product.id, Product.name, Product.description, Product.category, Product.savings_percentage)
+            .where(Product.is_active == True)
+            .order_by(Product.id)
+        )
+        rows = result.all()
+        # Tokenizing the catalog is CPU work; keep it off the event loop
+        return await asyncio.to_thread(SearchIndex, rows, postings)
+
+    async def refresh(self, postings: bool):
+        try:
+            async with self.lock:
+                async with read_router.session() as db:
+                    self.index = await self.build(db, postings)
+        except Exception as e:
+            print(f"Search index refresh failed: {e}")
+
+    async def get(self, db: AsyncSession, postings: bool) -> SearchIndex:
+        if self.index is None:
+            async with self.lock:
+                if self.index is None:
+                    self.stale = False
+                    self.index = await self.build(db, postings)
+            return self.index
+        if (self.stale or time.monotonic() - self.index.built_at > self.ttl) and not (
+            self.refreshing and not self.refreshing.done()
+        ):
+            self.stale = False
+            self.refreshing = asyncio.create_task(self.refresh(postings))
+        return self.index
+
+index = IndexHolder(settings.SEARCH_INDEX_TTL_SECONDS)
+
+CONFIG = literal_column("'english'::regconfig")
+
+async def _match_sql(db: AsyncSession, terms: List[str], category: Optional[str], candidates: int) -> List[tuple]:
+    document = search_document(Product.name, Product.description)
+    tsquery = func.to_tsquery(CONFIG, " & ".join(f"{t}:*" for t in terms))
+    score = func.ts_rank(document, tsquery) * (
+        1 + settings.SEARCH_SAVINGS_WEIGHT * func.coalesce(Product.savings_percentage, 0) / 100
+    )
+    stmt = (
+        select(Product.id, score)
+        .where(Product.is_active == True, document.op("@@")(tsquery))
+        .order_by(score.desc(), Product.id)
+        .limit(candidates)
+    )
+    if category:
+        stmt = stmt.where(Product.category == category)
+    return [(product_id, float(s)) for product_id, s in (await db.execute(stmt)).all()]
+
+async def search(db: AsyncSession, q: str, category: Optional[str], limit: int, skip: int) -> dict:
+    """
+    One page of matching active products, best first, with their scores,
+    plus spelling suggestions when the query finds less than a page.
+    """
+    terms = list(dict.fromkeys(tokenize(q)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return {"results": [], "suggestions": []}
+    postgres = db.bind.dialect.name == "postgresql"
+    candidates = max(settings.SEARCH_CANDIDATES, skip + limit)
+    current = await index.get(db, postings=not postgres)
+    if postgres:
+        ranked = await _match_sql(db, terms, category, candidates)
+    else:
+        docs, scores = current.match(terms, candidates, category)
+        ranked = list(zip(current.ids[docs].tolist(), scores.tolist()))
+
+    # Momentum: decayed preorder rate, log-damped so one hot cluster can't bury relevance
+    now = time.time()
+    weight = settings.SEARCH_MOMENTUM_WEIGHT
+    ranked = [
+        (product_id, score * (1 + weight * math.log1p(velocity.velocity(product_id, now))))
+        for product_id, score in ranked
+    ]
+    ranked.sort(key=lambda r: (-r[1], r[0]))
+    page = dict(ranked[skip:skip + limit])
+
+    products = []
+    if page:
+        # The in-process index can lag activation changes; the database has the final say
+        result = await db.execute(select(Product).where(Product.id.in_(list(page)), Product.is_active == True))
+        products = sorted(result.scalars().all(), key=lambda p: (-page[p.id], p.id))
+    return {
+        "results": [(product, round(page[product.id], 6)) for product in products],
+        "suggestions": current.suggest(terms) if len(ranked) < limit else [],
+    }
@@ -0,0 +1,255 @@
+"""
+Cluster settlement.
+
+A cluster (product) is due once its deadline has passed or its preorders
+reach target_quantity. The sweeper claims due clusters with one UPDATE:
+it marks them confirming or cancelling, stamps settlement_claimed_at and
+deactivates them so no new preorders arrive. Candidates are picked FOR
+UPDATE SKIP LOCKED on PostgreSQL, so concurrent workers split the work
+instead of queueing. On SQLite the single writer and the conditional
+UPDATE give the same outcome. Each claimed cluster's open preorders are
+then moved in chunks of SETTLEMENT_CHUNK_ROWS, one short transaction per
+chunk. Each chunk also refreshes the claim, and a claim older than
+SETTLEMENT_LEASE_SECONDS is taken over by the next sweep. A cluster that
+fails gets its units taken back off current_preorders.
+
+Due-by-deadline clusters come from the partial deadline index. Clusters
+that reach target are reported by counters.add_to_products and settled
+on the next wake-up, without scanning the catalog.
+
+Preorders lock their products (lock_clusters) before checking they're
+still open, so none can join a cluster after its claim and stay pending.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import cache
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.product import Preorder, Product
+from app.services import counters, rollups
+
+CONFIRMING, CANCELLING = "confirming", "cancelling"
+SUCCEEDED, FAILED = "succeeded", "failed"
+OPEN_STATUSES = ("pending", "confirmed")
+
+# Products whose current_preorders reached target since the last sweep
+_reached: Set[int] = set()
+_wake = asyncio.Event()
+_stopping = asyncio.Event()
+
+def notify_reached(product_ids: Iterable[int]):
+    """Queue clusters that hit their target; the settlement loop wakes up for them"""
+    before = len(_reached)
+    _reached.update(product_ids)
+    if len(_reached) > before:
+        _wake.set()
+
+async def lock_clusters(db: AsyncSession, product_ids: Iterable[int]) -> Dict[int, Product]:
+    """
+    Load products that preorders are about to join, locked until the caller commits.
+    claim() skips locked rows and settle_cluster() waits on them, so a preorder
+    that passed accepts_preorders() is settled with the rest of its cluster.
+    """
+    # Sharded counters leave the product row alone, so a share lock is enough. Otherwise take
+    # the row lock the counter UPDATE needs now, so two preorders can't deadlock upgrading
+    sharded = settings.PREORDER_COUNTER_SHARDS > 0
+    result = await db.execute(
+        select(Product)
+        .where(Product.id.in_(sorted(set(product_ids))))
+        .with_for_update(read=sharded, key_share=not sharded)
+        .execution_options(populate_existing=True)
+    )
+    return {product.id: product for product in result.scalars().all()}
+
+def accepts_preorders(product: Product) -> bool:
+    return bool(product.is_active) and product.settlement_status is None
+
+def stop():
+    """Let the settlement loop exit instead of sweeping again; called from the app lifespan"""
+    _stopping.set()
+    _wake.set()
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+async def claim(db: AsyncSession, limit: int, reached: List[int], full_scan: bool = False) -> List[dict]:
+    """
+    Claim up to limit due clusters and deactivate them.
+    full_scan also looks for reached targets that were never reported,
+    e.g. preorders placed before this process started.
+    """
+    now = _utcnow()
+    # Sharded counters: units still in shard rows count towards the target
+    target_met = counters.preorders_total() >= Product.target_quantity
+    due = Product.deadline <= now.replace(tzinfo=None)  # deadline is a naive UTC column
+    if full_scan:
+        due = due | target_met
+    elif reached:
+        due = due | (Product.id.in_(reached) & target_met)
+    candidates = (
+        select(Product.id)
+        .where(Product.is_active == True, Product.settlement_status == None, due)
+        .order_by(Product.deadline, Product.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Product)
+        .where(Product.id.in_(candidates.scalar_subquery()), Product.settlement_status == None)
+        .values(
+            settlement_status=case((target_met, CONFIRMING), else_=CANCELLING),
+            settlement_claimed_at=now,
+            is_active=False,
+        )
+        .returning(
+            Product.id, Product.category, Product.current_preorders,
+            Product.tariff_impact, Product.savings_percentage, Product.settlement_status,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await rollups.record_deactivations(db, rows)
+    await db.commit()
+    return [{"id": row.id, "status": row.settlement_status} for row in rows]
+
+async def reclaim(db: AsyncSession, limit: int) -> List[dict]:
+    """Take over clusters whose claim holder stopped refreshing it"""
+    now = _utcnow()
+    stale = (
+        select(Product.id)
+        .where(
+            Product.settlement_status.in_((CONFIRMING, CANCELLING)),
+            Product.settlement_claimed_at < now - timedelta(seconds=settings.SETTLEMENT_LEASE_SECONDS),
+        )
+        .order_by(Product.settlement_claimed_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        update(Product)
+        .where(Product.id.in_(stale.scalar_subquery()))
+        .values(settlement_claimed_at=now)
+        .returning(Product.id, Product.settlement_status)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    await db.commit()
+    return [{"id": row.id, "status": row.settlement_status} for row in rows]
+
+async def settle_cluster(product_id: int, status: str, chunk: int) -> Optional[int]:
+    """
+    Move one claimed cluster's open preorders in chunked transactions, then finalize it.
+    Returns the number of preorders moved, or None if the claim was lost midway.
+    """
+    confirming = status == CONFIRMING
+    source = ("pending",) if confirming else OPEN_STATUSES
+    target = "confirmed" if confirming else "cancelled"
+    moved = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            # Refresh the claim first; a worker that took it over owns the cluster now
+            refreshed = await db.execute(
+                update(Product)
+                .where(Product.id == product_id, Product.settlement_status == status)
+                .values(settlement_claimed_at=_utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            if refreshed.rowcount == 0:
+                return None
+            batch = (
+                select(Preorder.id)
+                .where(Preorder.product_id == product_id, Preorder.status.in_(source))
+                .order_by(Preorder.id)
+                .limit(chunk)
+            )
+            result = await db.execute(
+                update(Preorder)
+                .where(Preorder.id.in_(batch.scalar_subquery()))
+                .values(status=target, updated_at=func.now())
+                .returning(Preorder.quantity)
+                .execution_options(synchronize_session=False)
+            )
+            quantities = result.scalars().all()
+            if not confirming:
+                await counters.increment_many(db, {product_id: -sum(q or 0 for q in quantities)})
+            if len(quantities) < chunk:
+                await db.execute(
+                    update(Product)
+                    .where(Product.id == product_id, Product.settlement_status == status)
+                    .values(settlement_status=SUCCEEDED if confirming else FAILED, settled_at=_utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        moved += len(quantities)
+        if len(quantities) < chunk:
+            return moved
+
+async def sweep(full_scan: bool = False) -> Dict[str, int]:
+    """Claim and settle every due cluster, a batch at a time"""
+    limit = settings.SETTLEMENT_BATCH_CLUSTERS
+    chunk = settings.SETTLEMENT_CHUNK_ROWS
+    reached = sorted(_reached)
+    _reached.clear()
+    stats = {"clusters": 0, "succeeded": 0, "failed": 0, "confirmed": 0, "cancelled": 0, "lost": 0}
+
+    async with AsyncSessionLocal() as db:
+        claimed = await reclaim(db, limit)
+    while True:
+        async with AsyncSessionLocal() as db:
+            fresh = await claim(db, limit, reached, full_scan)
+        if fresh:
+            await response_cache.invalidate(cache.PRODUCTS, cache.CATALOG)
+        claimed += fresh
+        if not claimed:
+            break
+        for cluster in claimed:
+            moved = await settle_cluster(cluster["id"], cluster["status"], chunk)
+            if moved is None:
+                stats["lost"] += 1
+                continue
+            confirming = cluster["status"] == CONFIRMING
+            stats["clusters"] += 1
+            stats["succeeded" if confirming else "failed"] += 1
+            stats["confirmed" if confirming else "cancelled"] += moved
+        if len(fresh) < limit:
+            break
+        claimed = []
+
+    if reached:
+        # Reported clusters that were row-locked elsewhere wait for the next sweep
+        async with AsyncSessionLocal() as db:
+            skipped = await db.scalars(select(Product.id).where(
+                Product.id.in_(reached),
+                Product.is_active == True,
+                Product.settlement_status == None,
+                counters.preorders_total() >= Product.target_quantity,
+            ))
+            _reached.update(skipped.all())
+    if stats["clusters"]:
+        await response_cache.invalidate(cache.PRODUCTS, cache.CATALOG)
+    return stats
+
+async def run_settlement_loop():
+    """Settle due clusters every SETTLEMENT_INTERVAL_SECONDS, or sooner when targets are hit"""
+    _stopping.clear()
+    full_scan = True
+    while not _stopping.is_set():
+        try:
+            stats = await sweep(full_scan)
+            full_scan = False
+            if stats["clusters"]:
+                print(f"Settled {stats['clusters']} clusters ({stats['succeeded']} succeeded, {stats['failed']} failed)")
+        except Exception as e:
+            # A cancelled sweep can surface as a driver error; don't retry against a closing engine
+            if _stopping.is_set() or asyncio.current_task().cancelling():
+                break
+            print(f"Settlement sweep failed: {e}")
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=settings.SETTLEMENT_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
@@ -0,0 +1,167 @@
+"""
+Preorder velocity tracking for /api/analytics/trending.
+
+Each preorder is recorded into per-product ring buffers (60 one-minute
+buckets and 24 hourly buckets) for sliding-window rates, and into an
+exponentially decayed score with half-life TRENDING_HALF_LIFE_MINUTES.
+Scores use forward decay: every product shares one landmark time, so a
+score only changes when that product gets a preorder and the relative
+order of the others is unaffected. That lets a top-K set be maintained
+exactly on write, and trending is read in O(K) with no products scan.
+
+State is per worker. It is warmed from recent preorders at startup.
+"""
+import math
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.product import Preorder
+
+MINUTE_SLOTS = 60
+HOUR_SLOTS = 24
+# Rebase scores before exp() gets near float overflow
+MAX_EXPONENT = 600.0
+
+class ProductWindow:
+    __slots__ = ("minutes", "minute_stamps", "hours", "hour_stamps", "last_seen")
+
+    def __init__(self):
+        self.minutes = array("i", [0] * MINUTE_SLOTS)
+        self.minute_stamps = array("q", [-1] * MINUTE_SLOTS)
+        self.hours = array("i", [0] * HOUR_SLOTS)
+        self.hour_stamps = array("q", [-1] * HOUR_SLOTS)
+        self.last_seen = 0.0
+
+    def add(self, quantity: int, ts: float):
+        minute = int(ts // 60)
+        slot = minute % MINUTE_SLOTS
+        if self.minute_stamps[slot] != minute:
+            self.minute_stamps[slot] = minute
+            self.minutes[slot] = 0
+        self.minutes[slot] += quantity
+
+        hour = int(ts // 3600)
+        slot = hour % HOUR_SLOTS
+        if self.hour_stamps[slot] != hour:
+            self.hour_stamps[slot] = hour
+            self.hours[slot] = 0
+        self.hours[slot] += quantity
+        self.last_seen = max(self.last_seen, ts)
+
+    def total(self, window_minutes: int, now: float) -> int:
+        """Units preordered within the trailing window"""
+        if window_minutes <= MINUTE_SLOTS:
+            current = int(now // 60)
+            return sum(
+                self.minutes[i] for i in range(MINUTE_SLOTS)
+                if 0 <= current - self.minute_stamps[i] < window_minutes
+            )
+        current = int(now // 3600)
+        hours = min(math.ceil(window_minutes / 60), HOUR_SLOTS)
+        return sum(
+            self.hours[i] for i in range(HOUR_SLOTS)
+            if 0 <= current - self.hour_stamps[i] < hours
+        )
+
+class VelocityTracker:
+    def __init__(self, half_life_minutes: float, top_k: int):
+        self.decay = math.log(2) / (half_life_minutes * 60)
+        self.top_k = top_k
+        self.landmark = time.time()
+        self.scores: Dict[int, float] = {}
+        self.windows: Dict[int, ProductWindow] = {}
+        self.top: Dict[int, float] = {}
+        self.floor: Optional[Tuple[float, int]] = None
+
+    def record(self, product_id: int, quantity: int, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        if self.decay * (ts - self.landmark) > MAX_EXPONENT:
+            self._rebase(ts)
+
+        window = self.windows.get(product_id)
+        if window is None:
+            window = self.windows[product_id] = ProductWindow()
+        window.add(quantity, ts)
+
+        score = self.scores.get(product_id, 0.0) + quantity * math.exp(self.decay * (ts - self.landmark))
+        self.scores[product_id] = score
+        self._offer(product_id, score)
+
+    def record_many(self, deltas: Dict[int, int], ts: Optional[float] = None):
+        for product_id, quantity in deltas.items():
+            if quantity > 0:
+                self.record(product_id, quantity, ts)
+
+    def _offer(self, product_id: int, score: float):
+        if product_id in self.top:
+            self.top[product_id] = score
+            if self.floor and self.floor[1] == product_id:
+                self._refresh_floor()
+            return
+        if len(self.top) < self.top_k:
+            self.top[product_id] = score
+            self._refresh_floor()
+        elif score > self.floor[0]:
+            del self.top[self.floor[1]]
+            self.top[product_id] = score
+            self._refresh_floor()
+
+    def _refresh_floor(self):
+        self.floor = min((s, p) for p, s in self.top.items()) if self.top else None
+
+    def _rebase(self, now: float):
+        """Move the landmark to now and drop products idle for longer than the hourly window"""
+        factor = math.exp(-self.decay * (now - self.landmark))
+        self.landmark = now
+        idle_before = now - HOUR_SLOTS * 3600
+        for product_id in list(self.scores):
+            if self.windows[product_id].last_seen < idle_before:
+                del self.scores[product_id]
+                del self.windows[product_id]
+            else:
+                self.scores[product_id] *= factor
+        self.top = {}
+        for product_id, score in sorted(self.scores.items(), key=lambda i: i[1], reverse=True)[:self.top_k]:
+            self.top[product_id] = score
+        self._refresh_floor()
+
+    def velocity(self, product_id: int, now: Optional[float] = None) -> float:
+        """Exponentially weighted preorder rate in units per hour"""
+        now = time.time() if now is None else now
+        score = self.scores.get(product_id, 0.0) * math.exp(-self.decay * (now - self.landmark))
+        return score * self.decay * 3600
+
+    def window_total(self, product_id: int, window_minutes: int, now: Optional[float] = None) -> int:
+        window = self.windows.get(product_id)
+        if window is None:
+            return 0
+        return window.total(window_minutes, time.time() if now is None else now)
+
+    def top_products(self) -> List[int]:
+        """Current top-K product ids, fastest first"""
+        return [p for p, _ in sorted(self.top.items(), key=lambda i: i[1], reverse=True)]
+
+def to_epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+async def warm_up(tracker: "VelocityTracker", hours: int):
+    """Replay recent preorders so a restarted worker doesn't start cold"""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            select(Preorder.product_id, Preorder.quantity, Preorder.created_at)
+            .where(Preorder.created_at >= since)
+            .order_by(Preorder.created_at)
+            .execution_options(yield_per=10000)
+        )
+        async for product_id, quantity, created_at in result:
+            if product_id is not None and quantity and created_at is not None:
+                tracker.record(product_id, quantity, to_epoch(created_at))
+
+velocity = VelocityTracker(settings.TRENDING_HALF_LIFE_MINUTES, settings.TRENDING_TOP_K)
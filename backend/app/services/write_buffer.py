@@ -0,0 +1,144 @@
+"""
+Group-commit pipeline for preorder bursts.
+
+Validated preorders are queued in-process and flushed as one multi-row
+INSERT plus one aggregated counter update per product, every
+PREORDER_BATCH_MAX_ROWS rows or PREORDER_BATCH_MAX_DELAY_MS, whichever
+comes first. Callers await their row, so a response is only sent once
+the batch that contains it has committed.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from app.core import cache
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.product import Preorder
+from app.services import counters, rollups, settlement
+from app.services.trending import velocity
+
+class PreorderWriteBuffer:
+    def __init__(self, max_rows: int, max_delay_ms: float):
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.stats = {
+            "batches": 0,
+            "rows": 0,
+            "failed_batches": 0,
+            "max_batch_rows": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        if not self.running:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Flush everything already queued, then stop the flusher"""
+        if self.running:
+            await self.queue.put(None)
+            await self.task
+        self.task = None
+
+    async def submit(self, values: dict) -> Preorder:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((values, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            stopping = False
+            while len(batch) < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self.flush(batch)
+            if stopping:
+                return
+
+    async def flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        started = time.perf_counter()
+        preorders = []
+        deltas: Dict[int, int] = {}
+        try:
+            async with AsyncSessionLocal() as db:
+                # Clusters claimed for settlement since the request was validated get None
+                products = await settlement.lock_clusters(db, (values["product_id"] for values, _ in batch))
+                accepted = []
+                for values, future in batch:
+                    product = products.get(values["product_id"])
+                    if product is None or not settlement.accepts_preorders(product):
+                        future.set_result(None)
+                        continue
+                    accepted.append((values, future))
+                    deltas[values["product_id"]] = deltas.get(values["product_id"], 0) + values["quantity"]
+                batch = accepted
+                if batch:
+                    result = await db.scalars(
+                        insert(Preorder).returning(Preorder, sort_by_parameter_order=True),
+                        [values for values, _ in batch],
+                    )
+                    preorders = result.all()
+                    await counters.increment_many(db, deltas)
+                    await rollups.record_preorders(db, [values for values, _ in batch])
+                await db.commit()
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        velocity.record_many(deltas)
+        await response_cache.invalidate(cache.PRODUCTS)
+
+        for (_, future), preorder in zip(batch, preorders):
+            if not future.done():
+                future.set_result(preorder)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["batches"] += 1
+        self.stats["rows"] += len(batch)
+        self.stats["max_batch_rows"] = max(self.stats["max_batch_rows"], len(batch))
+        self.stats["last_flush_ms"] = round(elapsed_ms, 3)
+        self.stats["total_flush_ms"] += elapsed_ms
+
+    def metrics(self) -> dict:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "total_flush_ms": round(self.stats["total_flush_ms"], 3),
+            "enabled": settings.PREORDER_WRITE_BUFFER,
+            "running": self.running,
+            "queue_depth": self.queue.qsize(),
+            "avg_batch_rows": round(self.stats["rows"] / batches, 2) if batches else 0,
+            "max_rows": self.max_rows,
+            "max_delay_ms": self.max_delay * 1000,
+        }
+
+preorder_buffer = PreorderWriteBuffer(
+    settings.PREORDER_BATCH_MAX_ROWS,
+    settings.PREORDER_BATCH_MAX_DELAY_MS,
+)
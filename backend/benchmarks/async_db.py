@@ -0,0 +1,58 @@
+import sys
+import os
+import asyncio
+import time
+import argparse
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text
+from app.core.database import SessionLocal, AsyncSessionLocal, async_engine, engine
+from app.models.product import Product
+
+def latency_query(latency_ms: float):
+    """A catalog read, padded with server-side sleep on PostgreSQL to model network RTT"""
+    if latency_ms and engine.dialect.name == "postgresql":
+        return text("SELECT pg_sleep(:s)").bindparams(s=latency_ms / 1000)
+    return select(Product).filter(Product.is_active == True).limit(20)
+
+async def sync_request(latency_ms: float):
+    # Old behaviour: sync Session inside an `async def` route blocks the loop
+    db = SessionLocal()
+    try:
+        db.execute(latency_query(latency_ms)).all()
+    finally:
+        db.close()
+
+async def async_request(latency_ms: float):
+    async with AsyncSessionLocal() as db:
+        (await db.execute(latency_query(latency_ms))).all()
+
+async def run(handler, requests: int, concurrency: int, latency_ms: float) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(latency_ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+async def main(requests: int, concurrency: int, latency_ms: float):
+    print(f"{requests} requests, concurrency {concurrency}, dialect {engine.dialect.name}")
+    before = await run(sync_request, requests, concurrency, latency_ms)
+    print(f"  sync Session (before):  {before:10.1f} req/s")
+    after = await run(async_request, requests, concurrency, latency_ms)
+    print(f"  AsyncSession (after):   {after:10.1f} req/s")
+    print(f"  speedup: {after / before:.2f}x")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent DB throughput: sync vs async sessions")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency_ms))
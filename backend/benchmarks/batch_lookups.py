@@ -0,0 +1,64 @@
+import sys
+import os
+import asyncio
+import time
+import argparse
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure the database, not the response cache
+os.environ["CACHE_BACKEND"] = "none"
+
+import httpx
+from sqlalchemy import func, select
+from app.main import app
+from app.core.database import AsyncSessionLocal, async_engine
+from app.models.product import Preorder
+
+async def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+async def main(repeat: int):
+    async with AsyncSessionLocal() as db:
+        email = (await db.execute(
+            select(Preorder.user_email).group_by(Preorder.user_email)
+            .order_by(func.count().desc()).limit(1)
+        )).scalar()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        orders = (await client.get(f"/api/preorders/user/{email}")).json()
+        ids = sorted({o["product_id"] for o in orders})
+
+        async def n_plus_one():
+            (await client.get(f"/api/preorders/user/{email}")).raise_for_status()
+            for product_id in ids:
+                (await client.get(f"/api/products/{product_id}")).raise_for_status()
+
+        async def batched():
+            (await client.get(f"/api/preorders/user/{email}")).raise_for_status()
+            (await client.get("/api/products/batch", params={"ids": ",".join(map(str, ids))})).raise_for_status()
+
+        async def expanded():
+            (await client.get(f"/api/preorders/user/{email}", params={"expand": "product"})).raise_for_status()
+
+        print(f"{email}: {len(orders)} preorders over {len(ids)} products")
+        for name, fn, requests in (
+            ("orders + one request per product", n_plus_one, 1 + len(ids)),
+            ("orders + /api/products/batch", batched, 2),
+            ("orders?expand=product", expanded, 1),
+        ):
+            print(f"  {name:34} {requests:4d} requests {await timed(fn, repeat):8.2f} ms")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="'My orders' page: N+1 product lookups vs batch vs expand")
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args().repeat))
@@ -0,0 +1,85 @@
+import sys
+import os
+import asyncio
+import time
+import argparse
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure the database, not the response cache
+os.environ["CACHE_BACKEND"] = "none"
+
+import httpx
+from sqlalchemy import func, insert, select
+from app.main import app
+from app.core.database import SessionLocal, async_engine
+from app.core.pagination import encode_cursor
+from app.models.product import Product
+
+def ensure_catalog(size: int):
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(Product.id)).filter(Product.is_active == True).scalar()
+        missing = size - existing
+        for start in range(0, max(missing, 0), 10000):
+            rows = [
+                {
+                    "name": f"Bench Product {existing + start + i}",
+                    "category": f"Bench{(start + i) % 20}",
+                    "retail_price": 100.0,
+                    "group_buy_price": 80.0,
+                    "savings_percentage": 20.0,
+                    "current_preorders": 0,
+                    "is_active": True,
+                }
+                for i in range(min(10000, missing - start))
+            ]
+            db.execute(insert(Product), rows)
+            db.commit()
+        if missing > 0:
+            print(f"Inserted {missing} synthetic products (run rebuild_rollups.py to refresh analytics)")
+    finally:
+        db.close()
+
+def cursor_before(page: int, limit: int) -> str:
+    """Cursor pointing at the last row of the previous page (setup, not timed)"""
+    db = SessionLocal()
+    try:
+        last_id = db.scalar(
+            select(Product.id).filter(Product.is_active == True)
+            .order_by(Product.id).offset(page * limit - 1).limit(1)
+        )
+        return encode_cursor(last_id)
+    finally:
+        db.close()
+
+async def timed(client: httpx.AsyncClient, params: dict, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get("/api/products/", params=params)
+        samples.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    samples.sort()
+    return samples[len(samples) // 2]
+
+async def main(page: int, limit: int, repeat: int):
+    cursor = cursor_before(page, limit)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        offset_ms = await timed(client, {"skip": page * limit, "limit": limit}, repeat)
+        keyset_ms = await timed(client, {"cursor": cursor, "limit": limit}, repeat)
+    await async_engine.dispose()
+    print(f"page {page} ({limit} rows/page), median of {repeat}:")
+    print(f"  offset paging: {offset_ms:8.2f} ms")
+    print(f"  keyset paging: {keyset_ms:8.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deep catalog paging: offset vs keyset")
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    ensure_catalog((args.page + 1) * args.limit)
+    asyncio.run(main(args.page, args.limit, args.repeat))
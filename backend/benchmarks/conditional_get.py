@@ -0,0 +1,56 @@
+import sys
+import os
+import asyncio
+import time
+import argparse
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from app.main import app
+from app.core.cache import response_cache
+from app.core.database import async_engine
+
+ROUTES = [
+    "/api/products/?limit=100",
+    "/api/products/1",
+    "/api/analytics/dashboard",
+    "/api/analytics/trending",
+    "/api/analytics/price-impact",
+]
+
+async def timed(client: httpx.AsyncClient, url: str, headers: dict, repeat: int):
+    samples, size = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 304:
+            response.raise_for_status()
+        size = int(response.headers.get("content-length", len(response.content)))
+    samples.sort()
+    return samples[len(samples) // 2], response.status_code, size
+
+async def main(repeat: int):
+    await response_cache.connect()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'route':32} {'200 ms':>8} {'bytes':>7} {'gzip ms':>8} {'bytes':>7} {'304 ms':>8}")
+        for url in ROUTES:
+            first = await client.get(url, headers={"Accept-Encoding": "identity"})
+            first.raise_for_status()
+            full, _, size = await timed(client, url, {"Accept-Encoding": "identity"}, repeat)
+            zipped, _, zipped_size = await timed(client, url, {"Accept-Encoding": "gzip"}, repeat)
+            revalidated, status, _ = await timed(
+                client, url, {"If-None-Match": first.headers["etag"], "Accept-Encoding": "gzip"}, repeat
+            )
+            assert status == 304, f"{url} revalidated with {status}"
+            print(f"{url:32} {full:8.2f} {size:7d} {zipped:8.2f} {zipped_size:7d} {revalidated:8.2f}")
+    await response_cache.close()
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full vs compressed vs 304 responses for cached read endpoints")
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(main(parser.parse_args().repeat))
@@ -0,0 +1,67 @@
+import sys
+import os
+import asyncio
+import time
+import argparse
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import func, select
+from app.main import app
+from app.core.database import AsyncSessionLocal, async_engine
+from app.models.product import Product, Preorder
+from app.services import counters
+
+async def preorder_count(product_id: int):
+    async with AsyncSessionLocal() as db:
+        product = await db.get(Product, product_id)
+        await counters.apply_pending(db, [product])
+        placed = await db.scalar(
+            select(func.sum(Preorder.quantity)).where(Preorder.product_id == product_id)
+        )
+        return product.current_preorders, int(placed or 0)
+
+async def main(product_id: int, requests: int, concurrency: int):
+    """Hammer one cluster with concurrent preorders and check no increment is lost"""
+    before, placed_before = await preorder_count(product_id)
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i: int):
+            async with semaphore:
+                response = await client.post("/api/preorders/", json={
+                    "product_id": product_id,
+                    "user_email": f"contention{i}@shield-test.com",
+                    "quantity": 1,
+                })
+                return response.status_code == 200
+
+        started = time.perf_counter()
+        ok = sum(await asyncio.gather(*(one(i) for i in range(requests))))
+        elapsed = time.perf_counter() - started
+
+    after, placed_after = await preorder_count(product_id)
+    print(f"{ok}/{requests} preorders accepted in {elapsed:.2f}s ({ok / elapsed:.1f}/s)")
+    print(f"counter: {before} -> {after} (expected {before + ok})")
+
+    async with AsyncSessionLocal() as db:
+        await counters.compact(db)
+    compacted, _ = await preorder_count(product_id)
+    await async_engine.dispose()
+
+    lost = (before + ok) - after
+    if lost or compacted != after or placed_after - placed_before != ok:
+        print(f"FAILED: {lost} lost updates, {compacted} after compaction")
+        sys.exit(1)
+    print("OK: no lost updates")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent preorder counter check")
+    parser.add_argument("--product-id", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.product_id, args.requests, args.concurrency))
@@ -0,0 +1,62 @@
+import sys
+import os
+import asyncio
+import time
+import tracemalloc
+import argparse
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert
+from app.core.database import SessionLocal, async_engine
+from app.models.product import Preorder
+from app.services import exports
+
+def ensure_preorders(size: int):
+    db = SessionLocal()
+    try:
+        existing = db.query(func.count(Preorder.id)).scalar()
+        missing = size - existing
+        for start in range(0, max(missing, 0), 10000):
+            rows = [
+                {
+                    "product_id": (start + i) % 100 + 1,
+                    "user_email": f"bench{(start + i) % 5000}@example.com",
+                    "quantity": 1,
+                    "price_locked": 80.0,
+                    "status": "pending",
+                }
+                for i in range(min(10000, missing - start))
+            ]
+            db.execute(insert(Preorder), rows)
+            db.commit()
+        if missing > 0:
+            print(f"Inserted {missing} synthetic preorders (run rebuild_rollups.py to refresh analytics)")
+    finally:
+        db.close()
+
+async def main(fmt: str, compress: bool):
+    query = exports.build_query("preorders", None, None, None)
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = 0
+    async for chunk in exports.stream_rows(query, fmt, compress):
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await async_engine.dispose()
+    print(f"preorders as {fmt}{' (gzip)' if compress else ''}:")
+    print(f"  bytes streamed: {size:,}")
+    print(f"  elapsed:        {elapsed:8.2f} s")
+    print(f"  peak memory:    {peak / 1024 / 1024:8.2f} MiB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming export throughput and peak memory")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--format", choices=list(exports.FORMATS), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+    ensure_preorders(args.rows)
+    asyncio.run(main(args.format, args.gzip))
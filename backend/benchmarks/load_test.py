@@ -0,0 +1,265 @@
+import sys
+import os
+import json
+import random
+import asyncio
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+import numpy as np
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+DEFAULT_MIX = "browse=40,search=5,trending=15,flash=15,analytics=8,account=8,admin=6,sourcing=1,export=2"
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[label] += 1
+            return None
+        self.samples[label].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+            return None
+        return response
+
+class Traffic:
+    """Realistic mixed scenarios; each method is one user action of one or more requests"""
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, products: list, hot: list, users: list):
+        self.client = client
+        self.rec = recorder
+        self.products = products
+        self.hot = hot
+        self.users = users
+
+    async def browse(self):
+        params = {"limit": 20}
+        if random.random() < 0.3:
+            params["category"] = random.choice(["Electronics", "Home", "Food", "Outdoors"])
+        response = await self.rec.call(self.client, "GET /api/products/", "GET", "/api/products/", params=params)
+        for _ in range(random.randint(0, 2)):
+            cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+            if not cursor:
+                break
+            response = await self.rec.call(
+                self.client, "GET /api/products/", "GET", "/api/products/", params={**params, "cursor": cursor}
+            )
+        product_id = random.choice(self.products)
+        await self.rec.call(self.client, "GET /api/products/{id}", "GET", f"/api/products/{product_id}")
+        if random.random() < 0.3:
+            await self.rec.call(
+                self.client, "GET /api/products/{id}/price-history", "GET", f"/api/products/{product_id}/price-history"
+            )
+        if random.random() < 0.2:
+            await self.rec.call(self.client, "GET /api/products/categories/list", "GET", "/api/products/categories/list")
+
+    async def search(self):
+        query = random.choice(["solar", "water filt", "grain", "inverter", "med kit", "genrator", "power bank"])
+        await self.rec.call(self.client, "GET /api/products/search", "GET", "/api/products/search", params={"q": query})
+
+    async def trending(self):
+        await self.rec.call(self.client, "GET /api/analytics/trending", "GET", "/api/analytics/trending")
+
+    async def flash(self):
+        """Flash sale: preorders concentrated on a handful of hot clusters"""
+        await self.rec.call(self.client, "POST /api/preorders/", "POST", "/api/preorders/", json={
+            "product_id": random.choice(self.hot),
+            "user_email": random.choice(self.users),
+            "quantity": random.randint(1, 3),
+        })
+
+    async def analytics(self):
+        await self.rec.call(self.client, "GET /api/analytics/dashboard", "GET", "/api/analytics/dashboard")
+        await self.rec.call(self.client, "GET /api/analytics/price-impact", "GET", "/api/analytics/price-impact")
+
+    async def account(self):
+        email = random.choice(self.users)
+        await self.rec.call(self.client, "GET /api/auth/check/{email}", "GET", f"/api/auth/check/{email}")
+        await self.rec.call(self.client, "GET /api/preorders/user/{email}", "GET", f"/api/preorders/user/{email}")
+
+    async def admin(self):
+        params = {"limit": 100, "sort": random.choice(["id", "total_spent", "order_count"])}
+        response = await self.rec.call(self.client, "GET /api/admin/users", "GET", "/api/admin/users", params=params)
+        cursor = response.headers.get("X-Next-Cursor") if response is not None else None
+        if cursor:
+            await self.rec.call(
+                self.client, "GET /api/admin/users", "GET", "/api/admin/users", params={**params, "cursor": cursor}
+            )
+
+    async def sourcing(self):
+        response = await self.rec.call(
+            self.client, "POST /api/sourcing/find-deals", "POST", "/api/sourcing/find-deals"
+        )
+        if response is not None:
+            job_id = response.json()["job_id"]
+            await self.rec.call(self.client, "GET /api/sourcing/jobs/{id}", "GET", f"/api/sourcing/jobs/{job_id}")
+
+    async def export(self):
+        await self.rec.call(
+            self.client, "GET /api/admin/export/{dataset}", "GET", "/api/admin/export/products",
+            params={"status": "pending_review"},
+        )
+
+async def discover(client: httpx.AsyncClient):
+    """Sample real ids and emails to drive traffic with (setup, not timed)"""
+    response = await client.get("/api/products/", params={"limit": 500})
+    response.raise_for_status()
+    products = [p["id"] for p in response.json()]
+    if not products:
+        raise SystemExit("No active products; run seed_data.py or generate_data.py first")
+    response = await client.get("/api/analytics/trending", params={"limit": 10})
+    hot = [p["id"] for p in response.json()["trending"]] or products[:10]
+    response = await client.get("/api/admin/users", params={"limit": 500})
+    users = [u["email"] for u in response.json()] or ["loadtest@example.com"]
+    return products, hot, users
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - {n for n in dir(Traffic) if not n.startswith("_")}
+    if unknown:
+        raise SystemExit(f"Unknown scenarios in --mix: {', '.join(sorted(unknown))}")
+    return {k: v for k, v in weights.items() if v > 0}
+
+async def drive(client: httpx.AsyncClient, mix: dict, duration: float, concurrency: int, warmup: float) -> tuple:
+    products, hot, users = await discover(client)
+    names, weights = list(mix), list(mix.values())
+
+    async def worker(traffic: Traffic, until: float):
+        while time.perf_counter() < until:
+            await getattr(traffic, random.choices(names, weights)[0])()
+
+    if warmup > 0:
+        warm = Recorder()
+        traffic = [Traffic(client, warm, products, hot, users) for _ in range(concurrency)]
+        until = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(t, until) for t in traffic))
+
+    recorder = Recorder()
+    traffic = [Traffic(client, recorder, products, hot, users) for _ in range(concurrency)]
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(t, started + duration) for t in traffic))
+    return recorder, time.perf_counter() - started
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    for label in sorted(set(recorder.samples) | set(recorder.errors)):
+        samples = np.array(recorder.samples.get(label, []))
+        endpoints[label] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(label, 0),
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(samples, 50)), 2) if len(samples) else None,
+            "p99_ms": round(float(np.percentile(samples, 99)), 2) if len(samples) else None,
+            "max_ms": round(float(samples.max()), 2) if len(samples) else None,
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return {"total_requests": total, "total_rps": round(total / elapsed, 2), "endpoints": endpoints}
+
+def print_report(summary: dict):
+    print(f"{'endpoint':44} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for label, e in summary["endpoints"].items():
+        p50 = f"{e['p50_ms']:9.2f}" if e["p50_ms"] is not None else f"{'-':>9}"
+        p99 = f"{e['p99_ms']:9.2f}" if e["p99_ms"] is not None else f"{'-':>9}"
+        print(f"{label:44} {e['requests']:7d} {e['errors']:5d} {e['rps']:8.1f} {p50} {p99}")
+    print(f"{'total':44} {summary['total_requests']:7d} {'':5} {summary['total_rps']:8.1f}")
+
+def compare(summary: dict, baseline_path: str, tolerance: float) -> bool:
+    """Print per-endpoint deltas against a stored run; False on any regression"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["summary"]
+    ok = True
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0%}):")
+    for label, e in summary["endpoints"].items():
+        before = baseline["endpoints"].get(label)
+        if not before or not before["p99_ms"] or e["p99_ms"] is None:
+            continue
+        p99_change = e["p99_ms"] / before["p99_ms"] - 1
+        rps_change = e["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        regressed = p99_change > tolerance or (e["errors"] > before["errors"] and e["errors"] > 0)
+        ok = ok and not regressed
+        flag = "REGRESSION" if regressed else ""
+        print(f"  {label:44} p99 {p99_change:+7.1%}  rps {rps_change:+7.1%}  {flag}")
+    total_change = summary["total_rps"] / baseline["total_rps"] - 1 if baseline["total_rps"] else 0.0
+    if total_change < -tolerance:
+        ok = False
+    print(f"  {'total throughput':44} {total_change:+7.1%}  {'REGRESSION' if total_change < -tolerance else ''}")
+    return ok
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+async def main(args) -> bool:
+    mix = parse_mix(args.mix)
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0) as client:
+            recorder, elapsed = await drive(client, mix, args.duration, args.concurrency, args.warmup)
+        database = "remote"
+    else:
+        # In-process: run the app's lifespan so background workers are live
+        from app.main import app
+        from app.core.database import async_engine
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30.0) as client:
+                recorder, elapsed = await drive(client, mix, args.duration, args.concurrency, args.warmup)
+        database = async_engine.dialect.name
+
+    summary = summarize(recorder, elapsed)
+    print_report(summary)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "database": database,
+            "base_url": args.base_url,
+            "mix": mix,
+            "duration_s": round(elapsed, 2),
+            "concurrency": args.concurrency,
+            "summary": summary,
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        return compare(summary, args.compare, args.tolerance)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mixed-traffic load test across every API router")
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent simulated users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight list")
+    parser.add_argument("--output", default=os.path.join(
+        RESULTS_DIR, f"load-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.json"
+    ))
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p99/throughput slowdown")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    sys.exit(0 if asyncio.run(main(args)) else 1)
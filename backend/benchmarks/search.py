@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.search import SearchIndex
+
+CATEGORIES = ["Electronics", "Home", "Outdoors", "Healthcare", "Food", "Transportation"]
+BRANDS = ["Eco", "Solar", "Pure", "Zenith", "Kitchen", "Swift", "Agri", "Volt", "Aqua", "Terra"]
+WORDS = (
+    "rice grain solar panel inverter battery water filter tank pump seed fertilizer irrigation drip "
+    "thermostat purifier headphone cooker scooter generator lantern stove cable charger kettle blender "
+    "tent backpack bicycle helmet mask glove sanitizer bandage cereal flour oil sugar bean lentil maize"
+).split()
+FILLER = "premium heavy duty bulk industrial grade portable compact wireless smart efficient durable".split()
+
+def synthetic(products: int, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(products):
+        nouns = rng.choice(WORDS, 2, replace=False)
+        name = f"{rng.choice(BRANDS)}{rng.choice(['Pro', 'Max', 'Plus', 'Lite'])} {nouns[0].title()} {nouns[1].title()} {i}"
+        description = " ".join(rng.choice(FILLER + WORDS, 12))
+        rows.append((i + 1, name, description, str(rng.choice(CATEGORIES)), float(rng.uniform(5, 45))))
+    return rows
+
+QUERIES = ["rice", "solar pan", "water filt", "inverter battery", "so", "premium rice cooker", "thermostat", "gen"]
+TYPOS = ["solr", "inverterr", "thermostta", "irigation", "lentl"]
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process product search over a synthetic catalog")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--candidates", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = synthetic(args.products)
+    started = time.perf_counter()
+    index = SearchIndex(rows)
+    built = time.perf_counter() - started
+    print(f"{args.products} products, {len(index.terms)} terms; index build {built:.2f} s")
+
+    print(f"{'query':24} {'hits':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for query in QUERIES:
+        terms = query.split()
+        docs, _ = index.match(terms, args.candidates)
+        p50, p99 = timed(lambda: index.match(terms, args.candidates), args.repeat)
+        print(f"{query:24} {len(docs):8d} {p50:8.2f} {p99:8.2f}")
+    for typo in TYPOS:
+        suggestions = index.suggest([typo])
+        p50, p99 = timed(lambda: index.suggest([typo]), args.repeat)
+        print(f"{typo + ' -> ' + (suggestions[0] if suggestions else '-'):24} {'':8} {p50:8.2f} {p99:8.2f}")
@@ -0,0 +1,101 @@
+import sys
+import os
+import asyncio
+import json
+import time
+import argparse
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+from app.api.analytics import TRENDING_COLUMNS
+from app.api.preorders import PREORDER_ROWS, PreorderResponse
+from app.api.products import PRODUCT_ROWS, ProductResponse
+from app.core import serialization
+from app.core.database import AsyncSessionLocal, async_engine
+from app.models.product import Preorder, Product
+
+def orm_json(payload) -> bytes:
+    """What the endpoints used to do after validation: stdlib JSON of model_dump output"""
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+async def products_orm(db, limit):
+    result = await db.execute(select(Product).filter(Product.is_active == True).order_by(Product.id).limit(limit))
+    return orm_json([ProductResponse.model_validate(p).model_dump(mode="json") for p in result.scalars().all()])
+
+async def products_rows(db, limit):
+    result = await db.execute(
+        select(*PRODUCT_ROWS.columns).filter(Product.is_active == True).order_by(Product.id).limit(limit)
+    )
+    return serialization.dumps(PRODUCT_ROWS.records(result.all()))
+
+async def preorders_orm(db, email):
+    result = await db.execute(select(Preorder).filter(Preorder.user_email == email))
+    return orm_json([PreorderResponse.model_validate(p).model_dump(mode="json") for p in result.scalars().all()])
+
+async def preorders_rows(db, email):
+    result = await db.execute(select(*PREORDER_ROWS.columns).filter(Preorder.user_email == email))
+    return serialization.dumps(PREORDER_ROWS.records(result.all()))
+
+async def trending_orm(db, limit):
+    result = await db.execute(
+        select(Product).filter(Product.is_active == True).order_by(Product.current_preorders.desc()).limit(limit)
+    )
+    return orm_json([
+        {
+            "id": p.id,
+            "name": p.name,
+            "current_preorders": p.current_preorders,
+            "target_quantity": p.target_quantity,
+            "savings_percentage": p.savings_percentage,
+        }
+        for p in result.scalars().all()
+    ])
+
+async def trending_rows(db, limit):
+    result = await db.execute(
+        select(*TRENDING_COLUMNS).filter(Product.is_active == True).order_by(Product.current_preorders.desc()).limit(limit)
+    )
+    return serialization.dumps([row._asdict() for row in result.all()])
+
+async def rate(fn, arg, repeat: int):
+    """Median rows/second over fresh sessions (an empty identity map, as per request)"""
+    samples, rows = [], 0
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            body = await fn(db, arg)
+            samples.append(time.perf_counter() - started)
+        rows = len(json.loads(body))
+    samples.sort()
+    return rows / samples[len(samples) // 2], body
+
+async def main(limit: int, repeat: int):
+    async with AsyncSessionLocal() as db:
+        email = (await db.execute(
+            select(Preorder.user_email).group_by(Preorder.user_email)
+            .order_by(func.count().desc()).limit(1)
+        )).scalar()
+
+    cases = [
+        ("GET /api/products/", products_orm, products_rows, limit),
+        ("GET /api/preorders/user/{email}", preorders_orm, preorders_rows, email),
+        ("GET /api/analytics/trending", trending_orm, trending_rows, min(limit, 100)),
+    ]
+    print(f"JSON encoder: {'orjson' if serialization.orjson else 'stdlib json'}")
+    print(f"{'endpoint':34} {'rows':>6} {'ORM rows/s':>12} {'Core rows/s':>12} {'speedup':>8}")
+    for name, before, after, arg in cases:
+        old_rate, old_body = await rate(before, arg, repeat)
+        new_rate, new_body = await rate(after, arg, repeat)
+        assert json.loads(old_body) == json.loads(new_body), f"{name}: payloads differ"
+        rows = len(json.loads(new_body))
+        print(f"{name:34} {rows:6d} {old_rate:12,.0f} {new_rate:12,.0f} {new_rate / old_rate:7.1f}x")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rows/second for ORM+Pydantic vs Core-row serialization of list endpoints")
+    parser.add_argument("--limit", type=int, default=500, help="product page size")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(main(args.limit, args.repeat))
@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.progress import ProgressHub
+
+async def consume(hub: ProgressHub, subscriber, received: list):
+    """Stands in for one SSE connection: drain the body generator"""
+    async for _ in hub.events(subscriber):
+        received[0] += 1
+
+async def main(args):
+    hub = ProgressHub()
+    received = [0]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscribers = [
+        hub.subscribe({i % 1000} if i < args.filtered else None)
+        for i in range(args.subscribers)
+    ]
+    tasks = [asyncio.create_task(consume(hub, s, received)) for s in subscribers]
+    await asyncio.sleep(0)
+    idle = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{args.subscribers} idle subscribers ({args.filtered} filtered): "
+          f"{idle / args.subscribers / 1024:.2f} KiB each")
+
+    for batch in (1, 50, 500):
+        hub.record({product_id: (product_id % 90, 100) for product_id in range(batch)})
+        received[0] = 0
+        started = time.perf_counter()
+        await hub.flush()
+        fanned = time.perf_counter() - started
+        await asyncio.sleep(0)
+        while any(s.frames for s in subscribers):
+            await asyncio.sleep(0)
+        delivered = time.perf_counter() - started
+        print(f"  batch of {batch:4d} clusters: fan-out {fanned * 1000:7.1f} ms, "
+              f"all written {delivered * 1000:7.1f} ms, {received[0]} frames")
+
+    for subscriber in subscribers:
+        subscriber.closed = True
+        subscriber.ready.set()
+    await asyncio.gather(*tasks)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cluster progress fan-out to many idle SSE subscribers")
+    parser.add_argument("--subscribers", type=int, default=20000)
+    parser.add_argument("--filtered", type=int, default=2000, help="subscribers watching a single product")
+    asyncio.run(main(parser.parse_args()))
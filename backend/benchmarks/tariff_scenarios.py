@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# Add the backend directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.tariffs import CatalogSnapshot
+
+CATEGORIES = ["Electronics", "Home", "Outdoors", "Healthcare", "Food", "Transportation"]
+COUNTRIES = ["CN", "NG", "NL", "US", "VN", "MX", ""]
+
+def synthetic(products: int, seed: int = 7) -> CatalogSnapshot:
+    rng = np.random.default_rng(seed)
+    retail = rng.uniform(10, 2000, products)
+    units = rng.poisson(20, products).astype(np.float64)
+    locked = np.floor(units * rng.uniform(0, 1, products))
+    group = retail * rng.uniform(0.5, 0.9, products)
+    return CatalogSnapshot(
+        ids=np.arange(1, products + 1),
+        categories=list(rng.choice(CATEGORIES, products)),
+        countries=list(rng.choice(COUNTRIES, products)),
+        retail=retail,
+        group=group,
+        tariff=rng.choice([0.0, 5.0, 10.0, 15.0, 25.0], products),
+        active=rng.random(products) > 0.1,
+        open_units=units,
+        locked_units=locked,
+        locked_value=locked * group,
+    )
+
+def scenarios(count: int):
+    rng = np.random.default_rng(11)
+    return [
+        {
+            "name": f"scenario {i}",
+            "default_rate": None if i % 3 else float(rng.uniform(0, 20)),
+            "rules": [
+                {"country": str(rng.choice(COUNTRIES[:-1])), "rate": float(rng.uniform(0, 60))},
+                {"category": str(rng.choice(CATEGORIES)), "rate": float(rng.uniform(0, 30))},
+                {"category": str(rng.choice(CATEGORIES)), "country": "CN", "rate": float(rng.uniform(0, 100))},
+            ],
+            "retail_pass_through": float(rng.uniform(0, 1)),
+        }
+        for i in range(count)
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tariff scenario simulation over a synthetic catalog")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--scenarios", type=int, default=50)
+    parser.add_argument("--top-products", type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    snapshot = synthetic(args.products)
+    built = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = snapshot.simulate(scenarios(args.scenarios), by_category=True, top_products=args.top_products)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.products} products, {args.scenarios} scenarios:")
+    print(f"  snapshot build: {built * 1000:8.1f} ms")
+    print(f"  simulation:     {elapsed * 1000:8.1f} ms ({elapsed * 1000 / args.scenarios:.2f} ms/scenario)")
+    print(f"  baseline open preorder savings: {result['baseline']['open_preorder_savings']:,.2f}")
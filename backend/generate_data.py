@@ -0,0 +1,192 @@
+import sys
+import os
+import io
+import csv
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+# Add the current directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import bindparam, func, insert, select, update
+from app.core.database import SessionLocal, engine
+from app.models.product import Preorder, Product
+from app.models.user import User
+from app.services.deal_finder import SUPPLIERS
+from rebuild_rollups import rebuild_rollups
+
+CATEGORIES = ["Electronics", "Home", "Outdoors", "Healthcare", "Food", "Transportation", "Energy", "Agriculture"]
+ADJECTIVES = ["Bulk", "Industrial", "Solar", "Smart", "Preserved", "Heavy-Duty", "Compact", "Protocol-Grade"]
+NOUNS = ["Inverter", "Filter Pack", "Grain Cluster", "Power Bank", "Irrigation Node", "Water Tank", "Med Kit", "Generator"]
+STATUSES = ["pending", "confirmed", "completed", "cancelled"]
+STATUS_WEIGHTS = [0.6, 0.25, 0.1, 0.05]
+
+def zipf_weights(n: int, skew: float, rng: np.random.Generator) -> np.ndarray:
+    """Popularity ~ 1/rank^skew, with ranks shuffled so hot rows aren't clustered by id"""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def spread_times(size: int, days: int, rng: np.random.Generator) -> list:
+    now = datetime.now(timezone.utc)
+    offsets = rng.uniform(0, days * 86400, size)
+    return [now - timedelta(seconds=float(s)) for s in offsets]
+
+def copy_rows(table: str, columns: list, rows: list):
+    """PostgreSQL COPY FROM STDIN through the sync driver"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            "" if row[c] is None else json.dumps(row[c]) if isinstance(row[c], dict) else row[c]
+            for c in columns
+        ])
+    buffer.seek(0)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        connection.commit()
+    finally:
+        connection.close()
+
+def bulk_insert(db, model, rows: list):
+    if not rows:
+        return
+    if engine.dialect.name == "postgresql":
+        copy_rows(model.__tablename__, list(rows[0]), rows)
+    else:
+        # Multi-row INSERT ... VALUES batches via insertmanyvalues
+        db.execute(insert(model), rows)
+        db.commit()
+
+def generate_products(db, count: int, batch: int, rng: np.random.Generator):
+    category_weights = zipf_weights(len(CATEGORIES), 1.0, rng)
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        retail = np.round(rng.lognormal(4.5, 1.0, size) + 5, 2)
+        group = np.round(retail * rng.uniform(0.6, 0.9, size), 2)
+        categories = rng.choice(len(CATEGORIES), size, p=category_weights)
+        suppliers = rng.integers(0, len(SUPPLIERS), size)
+        created = spread_times(size, 180, rng)
+        bulk_insert(db, Product, [
+            {
+                "name": f"{ADJECTIVES[(start + i) % len(ADJECTIVES)]} {NOUNS[(start + i) // len(ADJECTIVES) % len(NOUNS)]} #{start + i}",
+                "description": "Synthetic load-test product.",
+                "category": CATEGORIES[categories[i]],
+                "retail_price": float(retail[i]),
+                "group_buy_price": float(group[i]),
+                "savings_percentage": round(float((retail[i] - group[i]) / retail[i] * 100), 2),
+                "tariff_impact": float(rng.choice([0.0, 5.0, 10.0, 15.0, 25.0])),
+                "target_quantity": int(rng.choice([50, 100, 250, 1000])),
+                "current_preorders": 0,
+                "supplier_info": SUPPLIERS[suppliers[i]],
+                "sourced_from": "manual",
+                "is_active": bool(rng.random() < 0.95),
+                "is_approved": True,
+                "created_at": created[i],
+                "deadline": created[i] + timedelta(days=int(rng.integers(7, 60))),
+            }
+            for i in range(size)
+        ])
+        print(f"  products: {start + size}/{count}")
+
+def generate_users(db, count: int, first: int, batch: int, rng: np.random.Generator):
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        created = spread_times(size, 365, rng)
+        active = rng.random(size) < 0.97
+        bulk_insert(db, User, [
+            {
+                "email": f"user{first + start + i}@loadtest.example.com",
+                "full_name": f"Load Test User {first + start + i}",
+                "phone_number": None,
+                "is_active": bool(active[i]),
+                "is_protocol_activated": True,
+                "created_at": created[i],
+            }
+            for i in range(size)
+        ])
+        print(f"  users: {start + size}/{count}")
+
+def generate_preorders(db, count: int, users: range, batch: int, skew: float, rng: np.random.Generator):
+    products = db.execute(
+        select(Product.id, Product.group_buy_price).where(Product.is_active == True).order_by(Product.id)
+    ).all()
+    if not products or not users:
+        print("  no active products or users to preorder against")
+        return
+    product_ids = np.array([p.id for p in products])
+    prices = np.array([p.group_buy_price for p in products])
+    popularity = zipf_weights(len(products), skew, rng)
+    placed = np.zeros(len(products), dtype=np.int64)
+
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        picks = rng.choice(len(products), size, p=popularity)
+        quantity = rng.integers(1, 6, size)
+        buyers = rng.integers(users.start, users.stop, size)
+        statuses = rng.choice(len(STATUSES), size, p=STATUS_WEIGHTS)
+        created = spread_times(size, 30, rng)
+        bulk_insert(db, Preorder, [
+            {
+                "product_id": int(product_ids[picks[i]]),
+                "user_email": f"user{buyers[i]}@loadtest.example.com",
+                "quantity": int(quantity[i]),
+                "price_locked": float(prices[picks[i]]),
+                "status": STATUSES[statuses[i]],
+                "created_at": created[i],
+            }
+            for i in range(size)
+        ])
+        live = statuses != STATUSES.index("cancelled")
+        np.add.at(placed, picks[live], quantity[live])
+        print(f"  preorders: {start + size}/{count}")
+
+    # Products carry their running totals, so bump them by what was placed
+    stmt = (
+        update(Product.__table__)
+        .where(Product.__table__.c.id == bindparam("pid"))
+        .values(current_preorders=Product.__table__.c.current_preorders + bindparam("delta"))
+    )
+    touched = np.flatnonzero(placed)
+    for start in range(0, len(touched), batch):
+        db.execute(stmt, [
+            {"pid": int(product_ids[i]), "delta": int(placed[i])}
+            for i in touched[start:start + batch]
+        ])
+    db.commit()
+
+def generate(users: int, products: int, preorders: int, skew: float, batch: int, seed: int):
+    rng = np.random.default_rng(seed)
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        first_user = (db.scalar(select(func.max(User.id))) or 0) + 1
+        print(f"Generating {products} products, {users} users, {preorders} preorders ({engine.dialect.name})...")
+        generate_products(db, products, batch, rng)
+        generate_users(db, users, first_user, batch, rng)
+        generate_preorders(db, preorders, range(first_user, first_user + users), batch, skew, rng)
+    finally:
+        db.close()
+    print(f"Generated in {time.perf_counter() - started:.1f}s")
+
+    # Generated rows bypass the API, so rollups are rebuilt from scratch
+    asyncio.run(rebuild_rollups())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate production-scale synthetic data")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--preorders", type=int, default=1000000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(args.users, args.products, args.preorders, args.skew, args.batch, args.seed)
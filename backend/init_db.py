@@ -5,12 +5,21 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.database import Base, engine
-from app.models.product import Product, Preorder
+from app.models.product import Product, Preorder, ProductCounterShard
 from app.models.user import User
+from app.models.analytics import CategoryRollup, UserRollup
+from app.models.sourcing import SourcingJob
+from app.models.price_history import PriceObservation, PriceBucket
+from app.models.archive import PreorderArchiveFile, PreorderArchiveUserTotal, PreorderArchiveProductTotal
+from app.services import partitions
 
 def init_db():
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        created = partitions.ensure(conn)
+    if created:
+        print(f"Created preorder partitions: {', '.join(created)}")
     print("Done!")
 
 if __name__ == "__main__":
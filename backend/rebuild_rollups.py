@@ -0,0 +1,36 @@
+import sys
+import os
+import asyncio
+import argparse
+
+# Add the current directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import AsyncSessionLocal, async_engine
+from app.services import rollups
+
+async def rebuild_rollups():
+    print("Rebuilding analytics rollups...")
+    async with AsyncSessionLocal() as db:
+        count = await rollups.rebuild(db)
+    await async_engine.dispose()
+    print(f"Done! {count} categories.")
+
+async def check_rollups() -> bool:
+    print("Checking analytics rollups against a full recomputation...")
+    async with AsyncSessionLocal() as db:
+        mismatches = await rollups.check(db)
+    await async_engine.dispose()
+    for m in mismatches:
+        label = f"user {m['user_email']}" if "user_email" in m else (m["category"] or "(none)")
+        print(f"  {label}.{m['measure']}: stored {m['stored']}, expected {m['expected']}")
+    print("Rollups consistent." if not mismatches else f"{len(mismatches)} mismatches found.")
+    return not mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or verify analytics rollups")
+    parser.add_argument("--check", action="store_true", help="only compare, don't rewrite")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if asyncio.run(check_rollups()) else 1)
+    asyncio.run(rebuild_rollups())
@@ -5,14 +5,21 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.database import Base, engine
-from app.models.product import Product, Preorder
+from app.models.product import Product, Preorder, ProductCounterShard
 from app.models.user import User
+from app.models.analytics import CategoryRollup, UserRollup
+from app.models.sourcing import SourcingJob
+from app.models.price_history import PriceObservation, PriceBucket
+from app.models.archive import PreorderArchiveFile, PreorderArchiveUserTotal, PreorderArchiveProductTotal
+from app.services import partitions
 
 def reset_db():
     print("Dropping all tables...")
     Base.metadata.drop_all(bind=engine)
     print("Creating all tables...")
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        partitions.ensure(conn)
     print("Database reset complete!")
 
 if __name__ == "__main__":
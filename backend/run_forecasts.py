@@ -0,0 +1,26 @@
+import sys
+import os
+import asyncio
+import argparse
+
+# Add the current directory to sys.path to allow imports from 'app'
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import AsyncSessionLocal, async_engine
+from app.services import forecasting
+
+async def run_forecasts(full: bool):
+    print("Forecasting the full catalog..." if full else "Forecasting products with new prices...")
+    async with AsyncSessionLocal() as db:
+        stats = await forecasting.run(db, full=full)
+    await async_engine.dispose()
+    print(
+        f"Done! {stats['products']} products "
+        f"(load {stats['load_seconds']}s, fit {stats['fit_seconds']}s, write {stats['write_seconds']}s)."
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit price forecasts for the catalog")
+    parser.add_argument("--full", action="store_true", help="refit every product, not just stale ones")
+    args = parser.parse_args()
+    asyncio.run(run_forecasts(args.full))
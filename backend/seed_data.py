@@ -1,5 +1,6 @@
 import sys
 import os
+import asyncio
 from datetime import datetime, timedelta
 
 # Add the current directory to sys.path to allow imports from 'app'
@@ -7,6 +8,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.database import SessionLocal
 from app.models.product import Product
+from rebuild_rollups import rebuild_rollups
 
 def seed_data():
     db = SessionLocal()
@@ -107,6 +109,9 @@ def seed_data():
     db.commit()
     db.close()
     print("Seeding complete!")
+    
+    # Seeded rows bypass the API, so rollups are rebuilt from scratch
+    asyncio.run(rebuild_rollups())
 
 if __name__ == "__main__":
     seed_data()
@@ -13,6 +13,8 @@ import {
 import { api } from '@/lib/api';
 import { formatCurrency } from '@/lib/utils';
 
+const PAGE_SIZE = 100;
+
 interface AdminUser {
   id: number;
   email: string;
@@ -26,17 +28,22 @@ interface AdminUser {
 export default function UserRegistry() {
   const [users, setUsers] = useState<AdminUser[]>([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [search, setSearch] = useState('');
 
-  const fetchUsers = async () => {
+  // The registry is keyset-paginated; X-Next-Cursor points at the next page
+  const fetchUsers = async (cursor?: string) => {
     try {
-      setLoading(true);
-      const res = await api.get('/api/admin/users');
-      setUsers(res.data);
+      if (cursor) setLoadingMore(true); else setLoading(true);
+      const res = await api.get('/api/admin/users', { params: { limit: PAGE_SIZE, cursor } });
+      setUsers(prev => (cursor ? [...prev, ...res.data] : res.data));
+      setNextCursor(res.headers['x-next-cursor'] ?? null);
     } catch (err) {
       console.error('Failed to fetch user registry:', err);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -47,7 +54,8 @@ export default function UserRegistry() {
   const toggleStatus = async (id: number) => {
     try {
       await api.patch(`/api/admin/users/${id}/toggle-status`);
-      fetchUsers();
+      // Update in place so the pages loaded so far stay loaded
+      setUsers(prev => prev.map(u => (u.id === id ? { ...u, is_active: !u.is_active } : u)));
     } catch (err) {
       console.error('Failed to toggle user status:', err);
     }
@@ -162,6 +170,17 @@ export default function UserRegistry() {
               </tbody>
             </table>
           </div>
+          {!loading && nextCursor && (
+            <div className="border-t border-neutral-100 p-6 text-center">
+              <button
+                onClick={() => fetchUsers(nextCursor)}
+                disabled={loadingMore}
+                className="text-[10px] font-black uppercase tracking-widest text-secondary/40 hover:text-primary transition-colors cursor-pointer disabled:opacity-50"
+              >
+                {loadingMore ? 'Syncing...' : `Load More Identities (${users.length} loaded)`}
+              </button>
+            </div>
+          )}
         </div>
 
       </div>
@@ -14,18 +14,15 @@ import {
   Lock,
   ArrowBigUpDash
 } from 'lucide-react';
-import { preordersApi, productsApi } from '@/lib/api';
-import { Product } from '@/lib/types';
+import { preordersApi } from '@/lib/api';
+import { Preorder, Product } from '@/lib/types';
 import { formatCurrency } from '@/lib/utils';
 
-interface OrderWithProduct {
-  id: number;
-  product_id: number;
-  quantity: number;
-  price_locked: number;
-  status: string;
-  product: Product;
-}
+type OrderWithProduct = Preorder & { product: Product };
+
+// One request: the products come joined into the preorders (expand=product)
+const withProducts = (preorders: Preorder[]) =>
+  preorders.filter((order): order is OrderWithProduct => !!order.product);
 
 export default function OrdersPage() {
   const [email, setEmail] = useState('');
@@ -45,15 +42,8 @@ export default function OrdersPage() {
         const fetchSaved = async () => {
           try {
             setLoading(true);
-            const res = await preordersApi.getByUser(savedIdentity);
-            const preordersData = res.data;
-            const ordersWithDetails = await Promise.all(
-              preordersData.map(async (order: { product_id: number; id: number; quantity: number; price_locked: number; status: string }) => {
-                const productRes = await productsApi.getById(order.product_id);
-                return { ...order, product: productRes.data };
-              })
-            );
-            setOrders(ordersWithDetails);
+            const res = await preordersApi.getByUser(savedIdentity, 'product');
+            setOrders(withProducts(res.data));
             setSearched(true);
           } catch (err) {
             console.error('Auto-fetch failed:', err);
@@ -73,18 +63,8 @@ export default function OrdersPage() {
     try {
       setLoading(true);
       setError(null);
-      const res = await preordersApi.getByUser(email);
-      const preordersData = res.data;
-
-      // Fetch product details for each preorder
-      const ordersWithDetails = await Promise.all(
-        preordersData.map(async (order: { product_id: number; id: number; quantity: number; price_locked: number; status: string }) => {
-          const productRes = await productsApi.getById(order.product_id);
-          return { ...order, product: productRes.data };
-        })
-      );
-
-      setOrders(ordersWithDetails);
+      const res = await preordersApi.getByUser(email, 'product');
+      setOrders(withProducts(res.data));
       setSearched(true);
     } catch (err) {
       console.error('Failed to fetch orders:', err);
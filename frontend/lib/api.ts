@@ -18,6 +18,10 @@ export const productsApi = {
   getById: (id: number) =>
     api.get(`/api/products/${id}`),
   
+  // One request for many ids (up to 500) instead of one getById each
+  getBatch: (ids: number[]) =>
+    api.get('/api/products/batch', { params: { ids: ids.join(',') } }),
+  
   getCategories: () =>
     api.get('/api/products/categories/list'),
   
@@ -30,8 +34,8 @@ export const preordersApi = {
   create: (data: { product_id: number; user_email: string; quantity: number }) =>
     api.post('/api/preorders', data),
   
-  getByUser: (email: string) =>
-    api.get(`/api/preorders/user/${email}`),
+  getByUser: (email: string, expand?: 'product') =>
+    api.get(`/api/preorders/user/${email}`, { params: { expand } }),
   
   getById: (id: number) =>
     api.get(`/api/preorders/${id}`),
@@ -24,6 +24,7 @@ export interface Preorder {
   price_locked: number;
   status: 'pending' | 'confirmed' | 'completed' | 'cancelled';
   created_at: string;
+  product?: Product | null; // with expand=product
 }
 
 export interface DashboardStats {